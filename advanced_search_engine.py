@@ -1,30 +1,65 @@
 ﻿#!/usr/bin/env python3
 
+import asyncio
+import aiohttp
+import heapq
+import queue
 import requests
 import json
 import time
 import threading
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Callable, Iterator, AsyncIterator, Mapping
+from email.utils import parsedate_to_datetime
 import hashlib
 import os
+import sqlite3
+import unicodedata
 import re
-from urllib.parse import quote_plus
+from collections import deque
+try:
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+from urllib.parse import quote_plus, urlsplit, urlunsplit, parse_qsl, urlencode
 import logging
+from contextlib import aclosing
+from file_discovery import FileDiscovery
+from folder_index import FolderIndex, INDEXED_EXTENSIONS
+from folder_scanner import scan_folder
+from folder_watcher import FolderWatcher
+from local_query import compile_query
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SearchResult:
-    def __init__(self, title: str, url: str, snippet: str, source: str, relevance_score: float = 0.0):
+    def __init__(self, title: str, url: str, snippet: str, source: str, relevance_score: float = 0.0,
+                 metadata: Optional[Dict[str, Any]] = None):
         self.title = title
         self.url = url
         self.snippet = snippet
         self.source = source
         self.relevance_score = relevance_score
+        # Engine-specific extras, e.g. authors and PDF link for papers
+        self.metadata = metadata or {}
         self.timestamp = datetime.now()
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SearchResult':
+        result = cls(
+            title=data.get('title', ''),
+            url=data.get('url', ''),
+            snippet=data.get('snippet', ''),
+            source=data.get('source', ''),
+            relevance_score=data.get('relevance_score', 0.0),
+            metadata=data.get('metadata')
+        )
+        if data.get('timestamp'):
+            result.timestamp = datetime.fromisoformat(data['timestamp'])
+        return result
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             'title': self.title,
@@ -32,210 +67,937 @@ class SearchResult:
             'snippet': self.snippet,
             'source': self.source,
             'relevance_score': self.relevance_score,
+            'metadata': self.metadata,
             'timestamp': self.timestamp.isoformat()
         }
     
     def __str__(self) -> str:
         return f"[{self.source}] {self.title} - {self.url}"
 
+def normalize_query(query: str, sort_tokens: bool = False) -> str:
+    """Canonical form of a query: NFKC, case-folded, single-spaced, optionally token-sorted"""
+    tokens = unicodedata.normalize('NFKC', query).casefold().split()
+    if sort_tokens:
+        tokens.sort()
+    return ' '.join(tokens)
+
 class SearchCache:
-    def __init__(self, cache_file: str = "search_cache.json"):
+    """Persistent search cache backed by SQLite in WAL mode.
+
+    Inserts are single-row upserts and the store is bounded to ``max_entries`` by
+    evicting the least recently used rows. Entries are fresh for their engine's
+    TTL (``engine_ttls``, falling back to ``ttl``) and can then still be served
+    as stale for ``stale_ttl`` seconds while a refresh runs. Empty results are
+    cached for ``negative_ttl`` seconds and failed searches for ``failure_ttl``
+    seconds. Rows past their stale window are purged by a background thread.
+
+    Keys are built from the normalized query (see ``normalize_query``) plus the
+    engine and any extra request parameters. ``max_results`` is stored with the
+    entry instead, so an entry fetched for 20 results also answers a request for 5.
+    """
+
+    def __init__(self, cache_file: str = "search_cache.db", max_entries: int = 5000,
+                 ttl: int = 86400, purge_interval: int = 600,
+                 engine_ttls: Optional[Dict[str, int]] = None, stale_ttl: int = 7 * 86400,
+                 negative_ttl: int = 600, failure_ttl: int = 60, sort_tokens: bool = False):
         self.cache_file = cache_file
-        self.cache = self.load_cache()
+        self.sort_tokens = sort_tokens
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.engine_ttls = engine_ttls or {}
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+        self.purge_interval = purge_interval
         self.cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.normalization_hits = 0
+        self.subsumed_hits = 0
+        self.evictions = 0
+        self.expired_purged = 0
+        self.conn = self._connect()
+        self.size = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self._stop_event = threading.Event()
+        self._purge_thread = threading.Thread(target=self._purge_worker, daemon=True)
+        self._purge_thread.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.cache_file, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cache)")]
+        if columns and 'max_results' not in columns:
+            # Cache file from an older schema, nothing in it is worth migrating
+            conn.execute("DROP TABLE cache")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, results TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, "
+            "expires REAL NOT NULL, stale_until REAL NOT NULL, "
+            "raw_query TEXT NOT NULL, max_results INTEGER)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_stale_until ON cache(stale_until)")
+        return conn
+    
+    def normalize(self, query: str) -> str:
+        return normalize_query(query, self.sort_tokens)
+    
+    def get_cache_key(self, query: str, engine: str, params: Optional[Dict[str, Any]] = None) -> str:
+        key_parts = [self.normalize(query), engine, sorted((params or {}).items())]
+        return hashlib.md5(json.dumps(key_parts, default=str).encode()).hexdigest()
+    
+    def lookup(self, query: str, engine: str, max_results: Optional[int] = None,
+               params: Optional[Dict[str, Any]] = None,
+               allow_stale: bool = True) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Return (results, is_stale), or None on a miss. Results may be an empty (negative) entry."""
+        cache_key = self.get_cache_key(query, engine, params)
+        now = time.time()
+        with self.cache_lock:
+            row = self.conn.execute(
+                "SELECT results, expires, stale_until, raw_query, max_results FROM cache WHERE key = ?",
+                (cache_key,)
+            ).fetchone()
+            entry = self._read_entry(row, query, max_results, allow_stale, now)
+            if entry is not None:
+                self.conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, cache_key))
+        return entry
     
-    def load_cache(self) -> Dict[str, Any]:
+    def lookup_many(self, pairs: List[Tuple[str, str]], max_results: Optional[int] = None,
+                    allow_stale: bool = True) -> Dict[Tuple[str, str], Tuple[List[Dict[str, Any]], bool]]:
+        """Look up many (query, engine) pairs in a few statements; misses are left out"""
+        keys = {}
+        for query, engine in pairs:
+            keys.setdefault(self.get_cache_key(query, engine), []).append((query, engine))
+        found = {}
+        now = time.time()
+        key_list = list(keys)
+        with self.cache_lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = self.conn.execute(
+                    "SELECT key, results, expires, stale_until, raw_query, max_results FROM cache "
+                    f"WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                rows = {row[0]: row[1:] for row in rows}
+                hit_keys = []
+                for cache_key in chunk:
+                    for query, engine in keys[cache_key]:
+                        entry = self._read_entry(rows.get(cache_key), query, max_results, allow_stale, now)
+                        if entry is not None:
+                            found[(query, engine)] = entry
+                            hit_keys.append(cache_key)
+                self.conn.executemany("UPDATE cache SET accessed = ? WHERE key = ?", ((now, key) for key in set(hit_keys)))
+        return found
+    
+    def _read_entry(self, row: Optional[Tuple], query: str, max_results: Optional[int], allow_stale: bool,
+                    now: float) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Decide whether a (results, expires, stale_until, raw_query, max_results) row answers the request
+        and count the hit or miss; caller holds cache_lock"""
+        if row and (now < row[1] or (allow_stale and now < row[2])):
+            results = json.loads(row[0])
+            stored_max = row[4]
+            # An entry answers a larger request only if the engine already returned everything it had
+            subsumed = max_results is not None and stored_max is not None and stored_max > max_results
+            if (max_results is None or stored_max is None or stored_max >= max_results
+                    or len(results) < stored_max):
+                stale = now >= row[1]
+                self.hits += 1
+                if stale:
+                    self.stale_hits += 1
+                if not results:
+                    self.negative_hits += 1
+                if row[3] != query:
+                    self.normalization_hits += 1
+                if subsumed:
+                    self.subsumed_hits += 1
+                return results[:max_results] if max_results is not None else results, stale
+        self.misses += 1
+        return None
+    
+    def get(self, query: str, engine: str, max_results: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Fresh results only"""
+        entry = self.lookup(query, engine, max_results, allow_stale=False)
+        return entry[0] if entry else None
+    
+    def set(self, query: str, engine: str, results: List[Dict[str, Any]], max_results: Optional[int] = None,
+            params: Optional[Dict[str, Any]] = None, failed: bool = False):
+        cache_key = self.get_cache_key(query, engine, params)
+        now = time.time()
+        if failed:
+            expires = stale_until = now + self.failure_ttl
+        elif not results:
+            expires = stale_until = now + self.negative_ttl
+        else:
+            expires = now + self.engine_ttls.get(engine, self.ttl)
+            stale_until = expires + self.stale_ttl
+        payload = json.dumps(results, ensure_ascii=False)
         try:
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            with self.cache_lock:
+                exists = self.conn.execute(
+                    "SELECT stale_until FROM cache WHERE key = ?", (cache_key,)
+                ).fetchone()
+                if failed and exists and now < exists[0]:
+                    # A failed revalidation keeps serving the entry it was meant to refresh
+                    return
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO cache "
+                    "(key, results, created, accessed, expires, stale_until, raw_query, max_results) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (cache_key, payload, now, now, expires, stale_until, query, max_results)
+                )
+                if not exists:
+                    self.size += 1
+                if self.size > self.max_entries:
+                    self._evict_lru(self.size - self.max_entries)
         except Exception as e:
-            logger.error(f"Error loading cache: {e}")
-        return {}
+            logger.error(f"Error saving cache entry: {e}")
     
-    def save_cache(self):
+    def _evict_lru(self, count: int):
+        """Drop the ``count`` least recently used entries (caller holds the lock)"""
+        cursor = self.conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+            (count,)
+        )
+        self.size -= cursor.rowcount
+        self.evictions += cursor.rowcount
+    
+    def purge_expired(self) -> int:
+        """Remove entries past their stale window, returns the number removed"""
         try:
             with self.cache_lock:
-                with open(self.cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.cache, f, indent=2, ensure_ascii=False)
+                cursor = self.conn.execute(
+                    "DELETE FROM cache WHERE stale_until < ?", (time.time(),)
+                )
+                self.size -= cursor.rowcount
+                self.expired_purged += cursor.rowcount
+                return cursor.rowcount
         except Exception as e:
-            logger.error(f"Error saving cache: {e}")
-    
-    def get_cache_key(self, query: str, engine: str) -> str:
-        return hashlib.md5(f"{query}_{engine}".encode()).hexdigest()
-    
-    def get(self, query: str, engine: str) -> Optional[List[Dict[str, Any]]]:
-        cache_key = self.get_cache_key(query, engine)
-        cached_data = self.cache.get(cache_key)
-        if cached_data:
-            # Check if cache is still valid (24 hours)
-            cache_time = datetime.fromisoformat(cached_data['timestamp'])
-            if (datetime.now() - cache_time).total_seconds() < 86400:
-                return cached_data['results']
+            logger.error(f"Error purging expired cache entries: {e}")
+            return 0
+    
+    def _purge_worker(self):
+        while not self._stop_event.wait(self.purge_interval):
+            self.purge_expired()
+    
+    def clear(self):
+        with self.cache_lock:
+            self.conn.execute("DELETE FROM cache")
+            self.size = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit rate and size information"""
+        lookups = self.hits + self.misses
+        size_bytes = 0
+        for path in (self.cache_file, f"{self.cache_file}-wal"):
+            if os.path.exists(path):
+                size_bytes += os.path.getsize(path)
+        return {
+            'entries': self.size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stale_hits': self.stale_hits,
+            'negative_hits': self.negative_hits,
+            'normalization_hits': self.normalization_hits,
+            'subsumed_hits': self.subsumed_hits,
+            'evictions': self.evictions,
+            'expired_purged': self.expired_purged,
+            'size_bytes': size_bytes
+        }
+    
+    def close(self):
+        self._stop_event.set()
+        with self.cache_lock:
+            self.conn.close()
+
+class RateLimiter:
+    """Token bucket with an AIMD concurrency limit for one upstream API.
+
+    Requests wait for a token (``rate`` per second, up to ``burst`` saved) and for
+    a concurrency slot. Throttling responses (429, or 403 with an exhausted rate
+    limit) halve the concurrency limit and pause the bucket until Retry-After or
+    X-RateLimit-Reset; successes grow the limit back by one slot per window.
+    """
+    
+    THROTTLE_BACKOFF = 2.0
+    
+    def __init__(self, rate: float = 5.0, burst: int = 10, max_concurrency: int = 8):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.active = 0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._condition = None
+        self._condition_loop = None
+    
+    def set_max_concurrency(self, limit: int):
+        self.max_concurrency = limit
+        self.concurrency_limit = float(limit)
+    
+    def _reserve(self) -> float:
+        """Take a token, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition_loop is not loop:
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+        return self._condition
+    
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.active < max(1, int(self.concurrency_limit)))
+            self.active += 1
+        try:
+            while True:
+                delay = self._reserve()
+                if delay <= 0:
+                    return
+                await asyncio.sleep(delay)
+        except BaseException:
+            await self.release()
+            raise
+    
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.active -= 1
+            condition.notify_all()
+    
+    def acquire_sync(self):
+        """Blocking token wait for the requests-based path (no concurrency slot)"""
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+    
+    def on_response(self, status: int, headers: Mapping[str, str]) -> bool:
+        """Feed a response back into the limiter, returns True if it was throttled"""
+        remaining = _parse_int(headers.get('X-RateLimit-Remaining'))
+        reset_at = _parse_int(headers.get('X-RateLimit-Reset'))
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        throttled = status == 429 or (status == 403 and (remaining == 0 or retry_after is not None))
+        
+        with self._lock:
+            now = time.monotonic()
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+            
+            pause = None
+            if retry_after is not None:
+                pause = retry_after
+            elif remaining == 0 and reset_at is not None:
+                pause = max(0.0, reset_at - time.time())
+            elif throttled:
+                pause = self.THROTTLE_BACKOFF
+            if pause is not None:
+                self.blocked_until = max(self.blocked_until, now + pause)
+            
+            if throttled:
+                self.throttled += 1
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            elif status < 400:
+                self.concurrency_limit = min(
+                    float(self.max_concurrency),
+                    self.concurrency_limit + 1 / self.concurrency_limit
+                )
+        return throttled
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            'rate': self.rate,
+            'tokens': round(self.tokens, 2),
+            'concurrency_limit': round(self.concurrency_limit, 2),
+            'active': self.active,
+            'throttled': self.throttled,
+            'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 2)
+        }
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delay seconds or an HTTP date"""
+    if value is None:
         return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one engine.
+
+    Tracks the outcome and latency of the last ``window`` calls; calls slower
+    than ``slow_call_threshold`` count as failures. When the failure rate reaches
+    ``error_threshold`` the breaker opens and the engine is skipped for
+    ``cooldown`` seconds, after which a single trial call decides whether it
+    closes again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str = '', window: int = 20, min_calls: int = 5, error_threshold: float = 0.5,
+                 slow_call_threshold: float = 8.0, cooldown: float = 30.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = 0.0
+        self.skipped = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
     
-    def set(self, query: str, engine: str, results: List[Dict[str, Any]]):
-        cache_key = self.get_cache_key(query, engine)
-        self.cache[cache_key] = {
-            'results': results,
-            'timestamp': datetime.now().isoformat()
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.skipped += 1
+            return False
+    
+    def record(self, ok: bool, latency: float):
+        ok = ok and latency < self.slow_call_threshold
+        with self._lock:
+            self.outcomes.append((ok, latency))
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if ok:
+                    self.state = self.CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+            elif self.state == self.CLOSED and len(self.outcomes) >= self.min_calls:
+                if self._error_rate() >= self.error_threshold:
+                    self._open()
+    
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"Circuit for {self.name} opened after {self._error_rate():.0%} failures")
+    
+    def _error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile over the window, None until min_calls samples exist"""
+        with self._lock:
+            latencies = sorted(latency for _, latency in self.outcomes)
+        if len(latencies) < self.min_calls:
+            return None
+        return latencies[min(len(latencies) - 1, int(percentile / 100 * len(latencies)))]
+    
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            error_rate = self._error_rate()
+            calls = len(self.outcomes)
+        p95 = self.latency_percentile(95)
+        return {
+            'state': self.state,
+            'error_rate': round(error_rate, 3),
+            'p95_latency': round(p95, 3) if p95 is not None else None,
+            'calls': calls,
+            'skipped': self.skipped
         }
-        self.save_cache()
+
+class EngineHealth:
+    """Rolling health statistics for one engine, fed by real requests and background probes"""
+    
+    def __init__(self, window: int = 50):
+        self.outcomes = deque(maxlen=window)
+        self.last_error = None
+        self.last_error_at = None
+        self.last_success_at = None
+        self.last_probe_at = None
+        self.last_request_at = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, ok: bool, latency: float, error: Optional[str] = None, probe: bool = False):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.outcomes.append((ok, latency))
+            if ok:
+                self.last_success_at = now
+            else:
+                self.last_error = error
+                self.last_error_at = now
+            if probe:
+                self.last_probe_at = now
+            else:
+                self.last_request_at = time.monotonic()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            outcomes = list(self.outcomes)
+            snapshot = {
+                'samples': len(outcomes),
+                'last_error': self.last_error,
+                'last_error_at': self.last_error_at,
+                'last_success_at': self.last_success_at,
+                'last_probe_at': self.last_probe_at
+            }
+        latencies = sorted(latency for _, latency in outcomes)
+        snapshot['success_rate'] = (
+            round(sum(1 for ok, _ in outcomes if ok) / len(outcomes), 3) if outcomes else None
+        )
+        snapshot['p50_latency'] = round(latencies[len(latencies) // 2], 3) if latencies else None
+        snapshot['p95_latency'] = round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3) if latencies else None
+        return snapshot
 
 class SearchEngine:
-    def __init__(self, name: str, base_url: str, headers: Optional[Dict[str, str]] = None):
+    MAX_THROTTLE_RETRIES = 3
+    
+    def __init__(self, name: str, base_url: str, headers: Optional[Dict[str, str]] = None,
+                 rate: float = 5.0, burst: int = 10, max_concurrency: int = 8):
         self.name = name
         self.base_url = base_url
         self.headers = headers or {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        self.rate_limiter = RateLimiter(rate, burst, max_concurrency)
         self.session = requests.Session()
         self.session.headers.update(self.headers)
     
     def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
-        """Base search method - should be overridden by specific engines"""
+        """Blocking search using the engine's requests session"""
+        url, params = self._build_request(query, max_results)
+        response = self._make_request(url, params)
+        if not response:
+            return []
+        
+        try:
+            return self._parse_response(response.content, max_results)
+        except Exception as e:
+            logger.error(f"Error parsing {self.name} results: {e}")
+            return []
+    
+    async def asearch(self, session: aiohttp.ClientSession, query: str, max_results: int = 10) -> List[SearchResult]:
+        """Async search on a shared aiohttp session, raises on request or parse errors"""
+        url, params = self._build_request(query, max_results)
+        body = await self._amake_request(session, url, params)
+        return self._parse_response(body, max_results)
+    
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
+        """Return the URL and query parameters for a search - should be overridden by specific engines"""
+        raise NotImplementedError
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        """Turn a raw response body into results - should be overridden by specific engines"""
         raise NotImplementedError
     
-    def _make_request(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[requests.Response]:
+    def _build_probe_request(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Cheapest request that shows the engine is reachable.
+
+        None means the engine has no endpoint cheaper than a real search, so its
+        health comes from real traffic only.
+        """
+        return None
+    
+    def _make_request(self, url: str, params: Optional[Dict[str, Any]] = None,
+                      stream: bool = False) -> Optional[requests.Response]:
         try:
-            response = self.session.get(url, params=params, timeout=10)
+            for attempt in range(self.MAX_THROTTLE_RETRIES + 1):
+                self.rate_limiter.acquire_sync()
+                response = self.session.get(url, params=params, timeout=10, stream=stream)
+                throttled = self.rate_limiter.on_response(response.status_code, response.headers)
+                if not throttled or attempt == self.MAX_THROTTLE_RETRIES:
+                    break
+                response.close()
+                logger.warning(f"{self.name} throttled (HTTP {response.status_code}), queueing retry")
             response.raise_for_status()
             return response
         except Exception as e:
             logger.error(f"Error making request to {self.name}: {e}")
             return None
+    
+    async def _amake_request(self, session: aiohttp.ClientSession, url: str,
+                             params: Optional[Dict[str, Any]] = None) -> bytes:
+        async with aclosing(self._aiter_request(session, url, params)) as chunks:
+            return b''.join([chunk async for chunk in chunks])
+    
+    async def _aiter_request(self, session: aiohttp.ClientSession, url: str,
+                             params: Optional[Dict[str, Any]] = None,
+                             chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Yield the response body in chunks as it arrives; the limiter slot is held until the body is consumed"""
+        # Throttled requests wait in the limiter and retry instead of failing
+        for attempt in range(self.MAX_THROTTLE_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            try:
+                async with session.get(url, params=params, headers=self.headers) as response:
+                    throttled = self.rate_limiter.on_response(response.status, response.headers)
+                    if not throttled or attempt == self.MAX_THROTTLE_RETRIES:
+                        response.raise_for_status()
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            yield chunk
+                        return
+            finally:
+                await self.rate_limiter.release()
+            logger.warning(f"{self.name} throttled (HTTP {response.status}), queueing retry")
 
 class BraveSearchEngine(SearchEngine):
     def __init__(self):
-        super().__init__("Brave", "https://api.search.brave.com/res/v1/web/search")
+        super().__init__("Brave", "https://api.search.brave.com/res/v1/web/search", rate=1.0, burst=1)
     
-    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
         params = {
             'q': query,
             'count': min(max_results, 20)
         }
+        return self.base_url, params
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        data = json.loads(body)
+        results = []
         
-        response = self._make_request(self.base_url, params)
-        if not response:
-            return []
+        for item in data.get('web', {}).get('results', [])[:max_results]:
+            result = SearchResult(
+                title=item.get('title', ''),
+                url=item.get('url', ''),
+                snippet=item.get('description', ''),
+                source='Brave',
+                relevance_score=float(item.get('score', 0))
+            )
+            results.append(result)
         
-        try:
-            data = response.json()
-            results = []
-            
-            for item in data.get('web', {}).get('results', [])[:max_results]:
-                result = SearchResult(
-                    title=item.get('title', ''),
-                    url=item.get('url', ''),
-                    snippet=item.get('description', ''),
-                    source='Brave',
-                    relevance_score=float(item.get('score', 0))
-                )
-                results.append(result)
-            
-            return results
-        except Exception as e:
-            logger.error(f"Error parsing Brave results: {e}")
-            return []
+        return results
 
 class GitHubSearchEngine(SearchEngine):
     def __init__(self):
-        super().__init__("GitHub", "https://api.github.com/search/repositories")
+        # Unauthenticated search API allows 10 requests per minute
+        super().__init__("GitHub", "https://api.github.com/search/repositories", rate=10 / 60, burst=10)
     
-    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
         params = {
             'q': query,
             'sort': 'stars',
             'order': 'desc',
             'per_page': min(max_results, 30)
         }
+        return self.base_url, params
+    
+    def _build_probe_request(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # Does not count against the search rate limit
+        return "https://api.github.com/rate_limit", {}
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        data = json.loads(body)
+        results = []
         
-        response = self._make_request(self.base_url, params)
-        if not response:
-            return []
+        for item in data.get('items', [])[:max_results]:
+            result = SearchResult(
+                title=f"{item.get('full_name', '')} - {item.get('description', '')}",
+                url=item.get('html_url', ''),
+                snippet=item.get('description', ''),
+                source='GitHub',
+                relevance_score=float(item.get('stargazers_count', 0)) / 1000
+            )
+            results.append(result)
         
-        try:
-            data = response.json()
-            results = []
-            
-            for item in data.get('items', [])[:max_results]:
-                result = SearchResult(
-                    title=f"{item.get('full_name', '')} - {item.get('description', '')}",
-                    url=item.get('html_url', ''),
-                    snippet=item.get('description', ''),
-                    source='GitHub',
-                    relevance_score=float(item.get('stargazers_count', 0)) / 1000
-                )
-                results.append(result)
-            
-            return results
-        except Exception as e:
-            logger.error(f"Error parsing GitHub results: {e}")
-            return []
+        return results
 
 class WikipediaSearchEngine(SearchEngine):
-    def __init__(self):
-        super().__init__("Wikipedia", "https://en.wikipedia.org/api/rest_v1/page/summary")
+    """Wikipedia search with batched extract fetching.
+
+    By default titles, intro extracts and URLs come back from a single
+    ``generator=search`` request. With ``use_generator=False`` the engine runs a
+    plain title search and fetches extracts in one batch request for the articles
+    missing from the per-article cache, so articles are shared across queries.
+    Generator mode never needs that cache, so it does not write to it either.
+    """
     
-    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
-        # First, search for pages
-        search_url = "https://en.wikipedia.org/w/api.php"
-        search_params = {
+    def __init__(self, article_cache: Optional[SearchCache] = None, use_generator: bool = True):
+        super().__init__("Wikipedia", "https://en.wikipedia.org/w/api.php", rate=10.0, burst=20)
+        self.use_generator = use_generator
+        # Only the two-step mode reads or writes articles, so generator mode never opens the cache
+        self._article_cache = article_cache
+        if article_cache is None and not use_generator:
+            self._article_cache = self._open_article_cache()
+    
+    @staticmethod
+    def _open_article_cache() -> SearchCache:
+        return SearchCache("wikipedia_articles.db", max_entries=20000, ttl=7 * 86400)
+    
+    @property
+    def article_cache(self) -> SearchCache:
+        if self._article_cache is None:
+            # use_generator was switched off after construction
+            self._article_cache = self._open_article_cache()
+        return self._article_cache
+    
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
+        limit = min(max_results, 10)
+        if self.use_generator:
+            params = {
+                'action': 'query',
+                'format': 'json',
+                'formatversion': 2,
+                'generator': 'search',
+                'gsrsearch': query,
+                'gsrlimit': limit,
+                'prop': 'extracts|info',
+                'exintro': 1,
+                'explaintext': 1,
+                'exlimit': limit,
+                'inprop': 'url'
+            }
+        else:
+            params = {
+                'action': 'query',
+                'format': 'json',
+                'formatversion': 2,
+                'list': 'search',
+                'srsearch': query,
+                'srlimit': limit
+            }
+        return self.base_url, params
+    
+    def _build_probe_request(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return self.base_url, {'action': 'query', 'format': 'json', 'meta': 'siteinfo'}
+    
+    def _build_extracts_request(self, titles: List[str]) -> Tuple[str, Dict[str, Any]]:
+        params = {
             'action': 'query',
             'format': 'json',
-            'list': 'search',
-            'srsearch': query,
-            'srlimit': min(max_results, 10)
+            'formatversion': 2,
+            'titles': '|'.join(titles),
+            'prop': 'extracts|info',
+            'exintro': 1,
+            'explaintext': 1,
+            'exlimit': len(titles),
+            'inprop': 'url'
         }
+        return self.base_url, params
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        # generator=search response: pages carry their search rank in 'index'
+        articles = self._parse_articles(body)
+        articles.sort(key=lambda article: article['index'])
+        items = [{'title': article['title'], 'snippet': ''} for article in articles[:max_results]]
+        return self._build_results(items, {article['title']: article for article in articles})
+    
+    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+        if self.use_generator:
+            return super().search(query, max_results)
         
-        response = self._make_request(search_url, search_params)
+        url, params = self._build_request(query, max_results)
+        response = self._make_request(url, params)
         if not response:
             return []
         
         try:
-            data = response.json()
-            results = []
-            
-            for item in data.get('query', {}).get('search', [])[:max_results]:
-                page_title = item.get('title', '')
-                page_id = item.get('pageid', '')
-                
-                # Get page summary
-                summary_url = f"{self.base_url}/{quote_plus(page_title)}"
-                summary_response = self._make_request(summary_url)
-                
-                if summary_response:
-                    try:
-                        summary_data = summary_response.json()
-                        result = SearchResult(
-                            title=page_title,
-                            url=summary_data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                            snippet=summary_data.get('extract', ''),
-                            source='Wikipedia',
-                            relevance_score=float(item.get('score', 0)) / 100
-                        )
-                        results.append(result)
-                    except:
-                        # Fallback to basic info
-                        result = SearchResult(
-                            title=page_title,
-                            url=f"https://en.wikipedia.org/wiki/{quote_plus(page_title)}",
-                            snippet=item.get('snippet', ''),
-                            source='Wikipedia',
-                            relevance_score=float(item.get('score', 0)) / 100
-                        )
-                        results.append(result)
-            
-            return results
+            items = self._parse_search_items(response.content, max_results)
+            articles = self._get_cached_articles(items)
+            missing = [item['title'] for item in items if item['title'] not in articles]
+            if missing:
+                extracts_response = self._make_request(*self._build_extracts_request(missing))
+                if extracts_response:
+                    for article in self._store_articles(extracts_response.content):
+                        articles[article['title']] = article
+            return self._build_results(items, articles)
         except Exception as e:
             logger.error(f"Error parsing Wikipedia results: {e}")
             return []
+    
+    async def asearch(self, session: aiohttp.ClientSession, query: str, max_results: int = 10) -> List[SearchResult]:
+        if self.use_generator:
+            return await super().asearch(session, query, max_results)
+        
+        url, params = self._build_request(query, max_results)
+        items = self._parse_search_items(await self._amake_request(session, url, params), max_results)
+        articles = self._get_cached_articles(items)
+        missing = [item['title'] for item in items if item['title'] not in articles]
+        if missing:
+            try:
+                body = await self._amake_request(session, *self._build_extracts_request(missing))
+                for article in self._store_articles(body):
+                    articles[article['title']] = article
+            except Exception as e:
+                logger.warning(f"Wikipedia extract fetch failed: {e}")
+        return self._build_results(items, articles)
+    
+    def _parse_search_items(self, body: bytes, max_results: int) -> List[Dict[str, Any]]:
+        data = json.loads(body)
+        return data.get('query', {}).get('search', [])[:max_results]
+    
+    def _get_cached_articles(self, items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        articles = {}
+        for item in items:
+            cached = self.article_cache.get(item['title'], 'wikipedia_article')
+            if cached:
+                articles[item['title']] = cached[0]
+        return articles
+    
+    def _store_articles(self, body: bytes) -> List[Dict[str, Any]]:
+        """Parse an extracts|info response and write each article to the per-article cache"""
+        articles = self._parse_articles(body)
+        for article in articles:
+            self.article_cache.set(article['title'], 'wikipedia_article', [article])
+        return articles
+    
+    def _parse_articles(self, body: bytes) -> List[Dict[str, Any]]:
+        data = json.loads(body)
+        articles = []
+        for page in data.get('query', {}).get('pages', []):
+            if page.get('missing') or 'title' not in page:
+                continue
+            article = {
+                'title': page['title'],
+                'url': page.get('fullurl', ''),
+                'extract': page.get('extract', ''),
+                'index': page.get('index', 0)
+            }
+            articles.append(article)
+        return articles
+    
+    def _build_results(self, items: List[Dict[str, Any]], articles: Dict[str, Dict[str, Any]]) -> List[SearchResult]:
+        results = []
+        for rank, item in enumerate(items):
+            page_title = item.get('title', '')
+            article = articles.get(page_title)
+            # Search rank based score, the search API no longer reports one
+            relevance = 1.0 - rank / (len(items) + 1)
+            if article:
+                result = SearchResult(
+                    title=page_title,
+                    url=article['url'] or f"https://en.wikipedia.org/wiki/{quote_plus(page_title)}",
+                    snippet=article['extract'],
+                    source='Wikipedia',
+                    relevance_score=relevance
+                )
+            else:
+                # Fallback to basic info
+                result = SearchResult(
+                    title=page_title,
+                    url=f"https://en.wikipedia.org/wiki/{quote_plus(page_title)}",
+                    snippet=re.sub(r'<[^>]+>', '', item.get('snippet', '')),
+                    source='Wikipedia',
+                    relevance_score=relevance
+                )
+            results.append(result)
+        return results
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+ARXIV_NS = '{http://arxiv.org/schemas/atom}'
+
+class AtomEntryParser:
+    """Incremental Atom feed parser that emits one SearchResult per finished <entry>.
+
+    Uses lxml when installed and the stdlib parser otherwise. Each entry is
+    cleared once converted, so memory stays flat regardless of feed size.
+    """
+    
+    def __init__(self, source: str = 'ArXiv'):
+        self.source = source
+        self.parser = etree.XMLPullParser(events=('end',))
+    
+    def feed(self, chunk: bytes) -> List[SearchResult]:
+        """Feed a chunk of the response body and return the entries it completed"""
+        self.parser.feed(chunk)
+        results = []
+        for _, elem in self.parser.read_events():
+            if elem.tag != ATOM_NS + 'entry':
+                continue
+            results.append(self._entry_to_result(elem))
+            elem.clear()
+            # lxml keeps cleared siblings attached to the root; drop them too
+            if hasattr(elem, 'getprevious'):
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        return results
+    
+    def _entry_to_result(self, entry) -> SearchResult:
+        title, summary, url, published, pdf_url = "No Title", "No Summary", "", None, None
+        authors, categories = [], []
+        for child in entry:
+            tag, text = child.tag, (child.text or '').strip()
+            if tag == ATOM_NS + 'title' and text:
+                title = ' '.join(text.split())
+            elif tag == ATOM_NS + 'summary' and text:
+                summary = text
+            elif tag == ATOM_NS + 'id':
+                url = text
+            elif tag == ATOM_NS + 'published':
+                published = text or None
+            elif tag == ATOM_NS + 'author':
+                name = child.findtext(ATOM_NS + 'name')
+                if name:
+                    authors.append(name.strip())
+            elif tag == ATOM_NS + 'link' and child.get('title') == 'pdf':
+                pdf_url = child.get('href')
+            elif tag == ATOM_NS + 'category' and child.get('term'):
+                categories.append(child.get('term'))
+        
+        return SearchResult(
+            title=title,
+            url=url,
+            snippet=summary,
+            source=self.source,
+            relevance_score=0.8,  # Default score for academic papers
+            metadata={
+                'authors': authors,
+                'published': published,
+                'pdf_url': pdf_url,
+                'categories': categories
+            }
+        )
 
 class ArxivSearchEngine(SearchEngine):
+    """arXiv search that parses the Atom feed while it downloads.
+
+    Results are produced as each <entry> closes instead of after the whole
+    body has been read and parsed into a tree, and reading stops once
+    ``max_results`` entries have been seen.
+    """
+    
     def __init__(self):
-        super().__init__("ArXiv", "http://export.arxiv.org/api/query")
+        # arXiv asks for no more than one request every three seconds
+        super().__init__("ArXiv", "http://export.arxiv.org/api/query", rate=1 / 3, burst=1, max_concurrency=1)
     
-    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
         params = {
             'search_query': f'all:"{query}"',
             'start': 0,
@@ -243,45 +1005,62 @@ class ArxivSearchEngine(SearchEngine):
             'sortBy': 'relevance',
             'sortOrder': 'descending'
         }
-        
-        response = self._make_request(self.base_url, params)
+        return self.base_url, params
+    
+    def _build_probe_request(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # Returns only the feed header
+        return self.base_url, {'search_query': 'all:test', 'max_results': 0}
+    
+    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+        return list(self.stream(query, max_results))
+    
+    def stream(self, query: str, max_results: int = 10) -> Iterator[SearchResult]:
+        """Blocking search that yields results as entries finish parsing"""
+        url, params = self._build_request(query, max_results)
+        response = self._make_request(url, params, stream=True)
         if not response:
-            return []
+            return
         
+        parser = AtomEntryParser(self.name)
+        count = 0
         try:
-            # Parse XML response
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.content)
-            
-            results = []
-            for entry in root.findall('.//{http://www.w3.org/2005/Atom}entry')[:max_results]:
-                title_elem = entry.find('.//{http://www.w3.org/2005/Atom}title')
-                summary_elem = entry.find('.//{http://www.w3.org/2005/Atom}summary')
-                id_elem = entry.find('.//{http://www.w3.org/2005/Atom}id')
-                
-                title = title_elem.text if title_elem is not None and title_elem.text else "No Title"
-                summary = summary_elem.text if summary_elem is not None and summary_elem.text else "No Summary"
-                url = id_elem.text if id_elem is not None and id_elem.text else ""
-                
-                result = SearchResult(
-                    title=title,
-                    url=url,
-                    snippet=summary,
-                    source='ArXiv',
-                    relevance_score=0.8  # Default score for academic papers
-                )
-                results.append(result)
-            
-            return results
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                for result in parser.feed(chunk):
+                    yield result
+                    count += 1
+                    if count >= max_results:
+                        return
         except Exception as e:
-            logger.error(f"Error parsing ArXiv results: {e}")
-            return []
+            logger.error(f"Error parsing {self.name} results: {e}")
+        finally:
+            response.close()
+    
+    async def asearch(self, session: aiohttp.ClientSession, query: str, max_results: int = 10) -> List[SearchResult]:
+        async with aclosing(self.astream(session, query, max_results)) as results:
+            return [result async for result in results]
+    
+    async def astream(self, session: aiohttp.ClientSession, query: str,
+                      max_results: int = 10) -> AsyncIterator[SearchResult]:
+        """Async search that yields results as entries finish parsing, raises on errors"""
+        url, params = self._build_request(query, max_results)
+        parser = AtomEntryParser(self.name)
+        count = 0
+        async with aclosing(self._aiter_request(session, url, params)) as chunks:
+            async for chunk in chunks:
+                for result in parser.feed(chunk):
+                    yield result
+                    count += 1
+                    if count >= max_results:
+                        return
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        return AtomEntryParser(self.name).feed(body)[:max_results]
 
 class StackOverflowSearchEngine(SearchEngine):
     def __init__(self):
-        super().__init__("StackOverflow", "https://api.stackexchange.com/2.3/search/advanced")
+        super().__init__("StackOverflow", "https://api.stackexchange.com/2.3/search/advanced", rate=5.0, burst=10)
     
-    def search(self, query: str, max_results: int = 10) -> List[SearchResult]:
+    def _build_request(self, query: str, max_results: int) -> Tuple[str, Dict[str, Any]]:
         params = {
             'order': 'desc',
             'sort': 'relevance',
@@ -289,33 +1068,113 @@ class StackOverflowSearchEngine(SearchEngine):
             'site': 'stackoverflow',
             'pagesize': min(max_results, 20)
         }
+        return self.base_url, params
+    
+    def _build_probe_request(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return "https://api.stackexchange.com/2.3/info", {'site': 'stackoverflow'}
+    
+    def _parse_response(self, body: bytes, max_results: int) -> List[SearchResult]:
+        data = json.loads(body)
+        results = []
         
-        response = self._make_request(self.base_url, params)
-        if not response:
-            return []
+        for item in data.get('items', [])[:max_results]:
+            result = SearchResult(
+                title=item.get('title', ''),
+                url=item.get('link', ''),
+                snippet=item.get('body', '')[:200] + '...' if len(item.get('body', '')) > 200 else item.get('body', ''),
+                source='StackOverflow',
+                relevance_score=float(item.get('score', 0)) / 10
+            )
+            results.append(result)
         
-        try:
-            data = response.json()
-            results = []
-            
-            for item in data.get('items', [])[:max_results]:
-                result = SearchResult(
-                    title=item.get('title', ''),
-                    url=item.get('link', ''),
-                    snippet=item.get('body', '')[:200] + '...' if len(item.get('body', '')) > 200 else item.get('body', ''),
-                    source='StackOverflow',
-                    relevance_score=float(item.get('score', 0)) / 10
-                )
-                results.append(result)
+        return results
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL for de-duplication (scheme, www., trailing slash, tracking params, fragment)"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    scheme = 'https' if parts.scheme.lower() in ('http', 'https') else parts.scheme.lower()
+    params = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_')
+    )
+    return urlunsplit((scheme, host, parts.path.rstrip('/') or '/', urlencode(params), ''))
+
+class RankedMerge:
+    """Incrementally fuses per-engine result lists into one ranked, de-duplicated list.
+
+    The engines' raw scores are on incompatible scales, so the default 'rrf'
+    method (reciprocal rank fusion) only uses each result's rank within its
+    engine; 'normalized' min-max scales every engine's scores to 0-1 instead.
+    Results from several engines with the same canonical URL are merged, and the
+    input SearchResult objects are never modified.
+    """
+    
+    def __init__(self, max_results: int = 10, method: str = 'rrf', rrf_k: int = 60):
+        self.max_results = max_results
+        self.method = method
+        self.rrf_k = rrf_k
+        self.engine_count = 0
+        self.scores = {}
+        self.best = {}
+    
+    def add(self, engine_name: str, results: List[SearchResult]):
+        self.engine_count += 1
+        if self.method == 'normalized' and results:
+            low = min(r.relevance_score for r in results)
+            high = max(r.relevance_score for r in results)
+        
+        for rank, result in enumerate(results, 1):
+            if self.method == 'rrf':
+                contribution = 1.0 / (self.rrf_k + rank)
+            else:
+                contribution = (result.relevance_score - low) / (high - low) if high > low else 1.0
             
-            return results
-        except Exception as e:
-            logger.error(f"Error parsing StackOverflow results: {e}")
-            return []
+            key = canonicalize_url(result.url) if result.url else f"{engine_name}:{result.title}"
+            self.scores[key] = self.scores.get(key, 0.0) + contribution
+            best = self.best.get(key)
+            if best is None or contribution > best[0]:
+                self.best[key] = (contribution, engine_name, result)
+    
+    def top(self) -> List[SearchResult]:
+        # Scale fused scores so a result ranked first by every engine scores 1.0
+        if self.method == 'rrf':
+            max_score = self.engine_count / (self.rrf_k + 1)
+        else:
+            max_score = self.engine_count
+        
+        fused = []
+        for key, score in heapq.nlargest(self.max_results, self.scores.items(), key=lambda item: item[1]):
+            _, engine_name, result = self.best[key]
+            merged = SearchResult(
+                title=result.title,
+                url=result.url,
+                snippet=result.snippet,
+                source=f"{engine_name.title()}: {result.source}",
+                relevance_score=score / max_score if max_score else 0.0,
+                metadata=result.metadata
+            )
+            merged.timestamp = result.timestamp
+            fused.append(merged)
+        return fused
+
+# Fresh-cache lifetimes: papers and encyclopedia articles change slowly, repository rankings quickly
+DEFAULT_ENGINE_TTLS = {
+    'arxiv': 7 * 86400,
+    'wikipedia': 3 * 86400,
+    'brave': 12 * 3600,
+    'stackoverflow': 6 * 3600,
+    'github': 3600
+}
 
 class AdvancedSearchEngine:
-    def __init__(self):
-        self.cache = SearchCache()
+    def __init__(self, engine_concurrency: Optional[Dict[str, int]] = None,
+                 query_deadline: float = 15.0, pool_size: int = 100, fusion_method: str = 'rrf',
+                 breaker_config: Optional[Dict[str, Any]] = None, hedge_requests: bool = False,
+                 probe_interval: Optional[float] = 300.0, bulk_concurrency: int = 16):
+        self.cache = SearchCache(engine_ttls=DEFAULT_ENGINE_TTLS)
         self.engines = {
             'brave': BraveSearchEngine(),
             'github': GitHubSearchEngine(),
@@ -323,41 +1182,221 @@ class AdvancedSearchEngine:
             'arxiv': ArxivSearchEngine(),
             'stackoverflow': StackOverflowSearchEngine()
         }
+        for engine_name, limit in (engine_concurrency or {}).items():
+            if engine_name in self.engines:
+                self.engines[engine_name].rate_limiter.set_max_concurrency(limit)
+        self.breakers = {
+            engine_name: CircuitBreaker(engine.name, **(breaker_config or {}))
+            for engine_name, engine in self.engines.items()
+        }
+        self.health = {engine_name: EngineHealth() for engine_name in self.engines}
+        self.probe_interval = probe_interval
+        self.hedge_requests = hedge_requests
+        self.hedged_requests = 0
+        self.query_deadline = query_deadline
+        self.fusion_method = fusion_method
+        self.pool_size = pool_size
+        self.bulk_concurrency = bulk_concurrency
         self.search_history = []
+        self.folder_indexes = {}
+        self.folder_watchers = {}
+        self._index_lock = threading.Lock()
+        
+        # All remote searches run on one background event loop sharing one aiohttp session
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._session = None
+        self._probe_task = None
+        self._inflight = {}
+        self._shared_fetches = set()
+        self._background = set()
+        self.coalesced_requests = 0
     
-    def search(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10) -> Dict[str, List[SearchResult]]:
-        """Perform search across multiple engines"""
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="search-loop", daemon=True).start()
+                if self.probe_interval:
+                    self._probe_task = asyncio.run_coroutine_threadsafe(self._probe_loop(), self._loop)
+        return self._loop
+    
+    def _run_sync(self, coro) -> Any:
+        """Run a coroutine on the search loop and block until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+    
+    async def _on_loop(self, coro) -> Any:
+        """Await a coroutine on the search loop from whichever loop the caller runs on"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+    
+    async def _search_engine(self, engine_name: str, query: str, max_results: int) -> List[SearchResult]:
+        # Check cache first; stale entries are served immediately and refreshed in the background
+        entry = self.cache.lookup(query, engine_name, max_results)
+        if entry is not None:
+            cached_results, stale = entry
+            if stale:
+                self._start_fetch(engine_name, query, max_results)
+            return [SearchResult.from_dict(r) for r in cached_results]
+        
+        # The fetch is shielded so a caller hitting its deadline does not cancel it for the others
+        return list(await asyncio.shield(self._start_fetch(engine_name, query, max_results)))
+    
+    def _start_fetch(self, engine_name: str, query: str, max_results: int) -> asyncio.Future:
+        """Single-flight: concurrent identical searches share one upstream fetch"""
+        key = (self.cache.normalize(query), engine_name, max_results)
+        fetch = self._inflight.get(key)
+        if fetch is not None:
+            self.coalesced_requests += 1
+            self._shared_fetches.add(fetch)
+        else:
+            fetch = asyncio.ensure_future(self._fetch_engine(engine_name, query, max_results))
+            self._inflight[key] = fetch
+            fetch.add_done_callback(lambda f: self._inflight.pop(key, None))
+            fetch.add_done_callback(self._shared_fetches.discard)
+        return fetch
+    
+    def _abandon_fetch(self, fetch: asyncio.Future):
+        """Cancel a fetch its only caller no longer wants; one another caller joined is left to finish"""
+        if fetch not in self._shared_fetches:
+            fetch.cancel()
+    
+    async def _fetch_engine(self, engine_name: str, query: str, max_results: int) -> List[SearchResult]:
+        engine = self.engines[engine_name]
+        breaker = self.breakers[engine_name]
+        if not breaker.allow():
+            logger.info(f"Skipping {engine.name}: circuit {breaker.state}")
+            return []
+        
+        started = time.monotonic()
+        try:
+            if self.hedge_requests:
+                engine_results = await self._hedged_search(engine_name, query, max_results)
+            else:
+                engine_results = await engine.asearch(self._get_session(), query, max_results)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            latency = time.monotonic() - started
+            breaker.record(False, latency)
+            self.health[engine_name].record(False, latency, str(e) or type(e).__name__)
+            logger.error(f"Error searching {engine.name}: {e}")
+            self.cache.set(query, engine_name, [], max_results, failed=True)
+            return []
+        latency = time.monotonic() - started
+        breaker.record(True, latency)
+        self.health[engine_name].record(True, latency)
+        
+        # Cache results
+        self.cache.set(query, engine_name, [r.to_dict() for r in engine_results], max_results)
+        return engine_results
+    
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self._probe_engines()
+            except Exception as e:
+                logger.error(f"Engine health probe failed: {e}")
+    
+    async def _probe_engines(self, force: bool = False):
+        """Probe, concurrently, every engine without real traffic in the last probe interval.
+
+        Engines without a cheap probe request are skipped; only real searches update their health.
+        """
+        now = time.monotonic()
+        idle = [
+            engine_name for engine_name, health in self.health.items()
+            if (force or not self.probe_interval or now - health.last_request_at >= self.probe_interval)
+            and self.engines[engine_name]._build_probe_request() is not None
+        ]
+        await asyncio.gather(*(self._probe_engine(engine_name) for engine_name in idle))
+    
+    async def _probe_engine(self, engine_name: str):
+        engine = self.engines[engine_name]
+        url, params = engine._build_probe_request()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(engine._amake_request(self._get_session(), url, params), timeout=10)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.health[engine_name].record(False, time.monotonic() - started, str(e) or type(e).__name__, probe=True)
+            return
+        self.health[engine_name].record(True, time.monotonic() - started, probe=True)
+    
+    async def _hedged_search(self, engine_name: str, query: str, max_results: int) -> List[SearchResult]:
+        """Send a duplicate request once the engine's p95 latency has passed, use whichever answers first"""
+        engine = self.engines[engine_name]
+        primary = asyncio.ensure_future(engine.asearch(self._get_session(), query, max_results))
+        hedge_after = self.breakers[engine_name].latency_percentile(95)
+        if hedge_after is None:
+            return await primary
+        
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        self.hedged_requests += 1
+        hedge = asyncio.ensure_future(engine.asearch(self._get_session(), query, max_results))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both attempts failed
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _stream_engines(self, query: str, engines: Optional[List[str]], max_results: int,
+                              deadline: Optional[float],
+                              emit: Optional[Callable[[Optional[Tuple[str, List[SearchResult]]]], None]] = None
+                              ) -> Dict[str, List[SearchResult]]:
+        """Run the engines concurrently, passing each (engine_name, results) to emit as it completes"""
         if engines is None:
             engines = list(self.engines.keys())
+        deadline = deadline if deadline is not None else self.query_deadline
         
-        results = {}
-        threads = []
+        tasks = {
+            asyncio.ensure_future(self._search_engine(engine_name, query, max_results)): engine_name
+            for engine_name in engines if engine_name in self.engines
+        }
         
-        def search_engine(engine_name: str):
-            if engine_name in self.engines:
-                # Check cache first
-                cached_results = self.cache.get(query, engine_name)
-                if cached_results:
-                    results[engine_name] = [SearchResult(**r) for r in cached_results]
-                    return
-                
-                # Perform search
-                engine_results = self.engines[engine_name].search(query, max_results)
-                results[engine_name] = engine_results
-                
-                # Cache results
-                self.cache.set(query, engine_name, [r.to_dict() for r in engine_results])
-        
-        # Start threads for parallel search
-        for engine in engines:
-            if engine in self.engines:
-                thread = threading.Thread(target=search_engine, args=(engine,))
-                threads.append(thread)
-                thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        results = {}
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline
+        try:
+            while pending:
+                remaining = expires_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    engine_name = tasks[task]
+                    results[engine_name] = task.result()
+                    if emit:
+                        emit((engine_name, results[engine_name]))
+            for task in pending:
+                logger.warning(f"{tasks[task]} missed the {deadline}s query deadline")
+        finally:
+            for task in pending:
+                task.cancel()
         
         # Add to search history
         self.search_history.append({
@@ -369,65 +1408,318 @@ class AdvancedSearchEngine:
         
         return results
     
-    def combi_fetch(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10) -> List[SearchResult]:
-        """Fetch results from multiple engines and combine them intelligently"""
+    async def asearch(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10,
+                      deadline: Optional[float] = None) -> Dict[str, List[SearchResult]]:
+        """Perform search across multiple engines concurrently on the shared session"""
+        return await self._on_loop(self._stream_engines(query, engines, max_results, deadline))
+    
+    def search(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10,
+               deadline: Optional[float] = None) -> Dict[str, List[SearchResult]]:
+        """Perform search across multiple engines"""
+        return self._run_sync(self._stream_engines(query, engines, max_results, deadline))
+    
+    async def asearch_stream(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10,
+                             deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, List[SearchResult]]]:
+        """Yield (engine_name, results) in completion order"""
+        caller_loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        
+        def emit(item):
+            try:
+                caller_loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                pass  # Caller's loop already closed
+        
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_engines(query, engines, max_results, deadline, emit), self._ensure_loop()
+        )
+        future.add_done_callback(lambda f: emit(None))
+        try:
+            while True:
+                item = await items.get()
+                if item is None:
+                    break
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+    
+    def search_stream(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10,
+                      deadline: Optional[float] = None) -> Iterator[Tuple[str, List[SearchResult]]]:
+        """Blocking generator yielding (engine_name, results) in completion order"""
+        items = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_engines(query, engines, max_results, deadline, items.put), self._ensure_loop()
+        )
+        future.add_done_callback(lambda f: items.put(None))
+        try:
+            while True:
+                item = items.get()
+                if item is None:
+                    break
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+    
+    async def _search_many(self, queries: List[str], engines: Optional[List[str]], max_results: int,
+                           deadline: Optional[float], concurrency: Optional[int],
+                           emit: Optional[Callable[[Optional[Tuple[str, str, List[SearchResult]]]], None]] = None
+                           ) -> Dict[str, Dict[str, List[SearchResult]]]:
+        """Answer every (query, engine) pair from one bulk cache lookup plus at most ``concurrency`` fetches.
+        
+        Each fetch task holds a slot of one semaphore, shared with the stale refreshes, until
+        its upstream request ends, so fetches that missed the deadline still count against the
+        bound. Those still running when every pair has been answered or has timed out are cancelled.
+        """
         if engines is None:
             engines = list(self.engines.keys())
-            
-        engine_results = self.search(query, engines, max_results)
+        engines = [engine_name for engine_name in engines if engine_name in self.engines]
+        deadline = deadline if deadline is not None else self.query_deadline
+        semaphore = asyncio.Semaphore(concurrency or self.bulk_concurrency)
+        queries = list(dict.fromkeys(queries))
+        results = {query: {} for query in queries}
         
-        # Combine all results
-        all_results = []
-        for engine_name, results in engine_results.items():
-            for result in results:
-                result.source = f"{engine_name.title()}: {result.source}"
-                all_results.append(result)
+        def deliver(query: str, engine_name: str, engine_results: List[SearchResult]):
+            results[query][engine_name] = engine_results
+            if emit:
+                emit((query, engine_name, engine_results))
+        
+        pairs = [(query, engine_name) for query in queries for engine_name in engines]
+        cached = self.cache.lookup_many(pairs, max_results)
+        misses = []
+        stale_pairs = []
+        for query, engine_name in pairs:
+            entry = cached.get((query, engine_name))
+            if entry is None:
+                misses.append((query, engine_name))
+                continue
+            cached_results, stale = entry
+            if stale:
+                stale_pairs.append((query, engine_name))
+            deliver(query, engine_name, [SearchResult.from_dict(r) for r in cached_results])
+        unsettled = len(misses)
+        settled = asyncio.Event()
+        
+        async def fetch(query: str, engine_name: str):
+            nonlocal unsettled
+            async with semaphore:
+                upstream = self._start_fetch(engine_name, query, max_results)
+                try:
+                    done, _ = await asyncio.wait({upstream}, timeout=deadline)
+                    if done and not upstream.cancelled():
+                        deliver(query, engine_name, list(upstream.result()))
+                    else:
+                        logger.warning(f"{engine_name} missed the {deadline}s query deadline for {query!r}")
+                    unsettled -= 1
+                    if not unsettled:
+                        settled.set()
+                    # Keep the slot until the fetch ends or the batch is over
+                    await asyncio.wait({upstream})
+                except asyncio.CancelledError:
+                    self._abandon_fetch(upstream)
+                    raise
+        
+        # Misses are queued on the semaphore ahead of the stale refreshes
+        tasks = [asyncio.ensure_future(fetch(query, engine_name)) for query, engine_name in misses]
+        if stale_pairs:
+            # Refreshed in the background under the same bound, after the misses
+            task = asyncio.ensure_future(self._refresh_many(stale_pairs, max_results, semaphore))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        try:
+            if tasks:
+                await settled.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
         
-        # Sort by relevance score
-        all_results.sort(key=lambda x: x.relevance_score, reverse=True)
+        timestamp = datetime.now().isoformat()
+        for query in queries:
+            self.search_history.append({
+                'query': query,
+                'engines': engines,
+                'timestamp': timestamp,
+                'result_count': sum(len(r) for r in results[query].values())
+            })
         
-        return all_results[:max_results]
+        return results
+    
+    async def _refresh_many(self, pairs: List[Tuple[str, str]], max_results: int, semaphore: asyncio.Semaphore):
+        async def refresh(query: str, engine_name: str):
+            async with semaphore:
+                await asyncio.wait({self._start_fetch(engine_name, query, max_results)})
+        
+        await asyncio.gather(*(refresh(query, engine_name) for query, engine_name in pairs))
+    
+    async def asearch_many(self, queries: List[str], engines: Optional[List[str]] = None, max_results: int = 10,
+                           deadline: Optional[float] = None,
+                           concurrency: Optional[int] = None) -> Dict[str, Dict[str, List[SearchResult]]]:
+        """Async variant of search_many"""
+        return await self._on_loop(self._search_many(queries, engines, max_results, deadline, concurrency))
+    
+    def search_many(self, queries: List[str], engines: Optional[List[str]] = None, max_results: int = 10,
+                    deadline: Optional[float] = None,
+                    concurrency: Optional[int] = None) -> Dict[str, Dict[str, List[SearchResult]]]:
+        """Search several queries at once, returning query -> engine -> results.
+        
+        The cache is checked for all pairs up front; at most ``concurrency`` fetches
+        (default ``bulk_concurrency``) run at once on the one connection pool, so cost
+        grows with the pool rather than with the number of queries. ``deadline``
+        applies to each (query, engine) fetch; fetches still running when the batch
+        ends are cancelled.
+        """
+        return self._run_sync(self._search_many(queries, engines, max_results, deadline, concurrency))
+    
+    def search_many_stream(self, queries: List[str], engines: Optional[List[str]] = None, max_results: int = 10,
+                           deadline: Optional[float] = None,
+                           concurrency: Optional[int] = None) -> Iterator[Tuple[str, str, List[SearchResult]]]:
+        """Blocking generator yielding (query, engine_name, results), cache hits first, then in completion order"""
+        items = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._search_many(queries, engines, max_results, deadline, concurrency, items.put), self._ensure_loop()
+        )
+        future.add_done_callback(lambda f: items.put(None))
+        try:
+            while True:
+                item = items.get()
+                if item is None:
+                    break
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+    
+    def _combine_results(self, engine_results: Dict[str, List[SearchResult]], max_results: int) -> List[SearchResult]:
+        merge = RankedMerge(max_results, self.fusion_method)
+        for engine_name, results in engine_results.items():
+            merge.add(engine_name, results)
+        return merge.top()
+    
+    async def acombi_fetch(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10) -> List[SearchResult]:
+        """Async variant of combi_fetch"""
+        engine_results = await self.asearch(query, engines, max_results)
+        return self._combine_results(engine_results, max_results)
+    
+    def combi_fetch(self, query: str, engines: Optional[List[str]] = None, max_results: int = 10) -> List[SearchResult]:
+        """Fetch results from multiple engines and combine them intelligently"""
+        engine_results = self.search(query, engines, max_results)
+        return self._combine_results(engine_results, max_results)
+    
+    def combi_fetch_stream(self, query: str, engines: Optional[List[str]] = None,
+                           max_results: int = 10) -> Iterator[Tuple[str, List[SearchResult]]]:
+        """Yield (engine_name, combined top results so far) each time an engine finishes"""
+        merge = RankedMerge(max_results, self.fusion_method)
+        for engine_name, results in self.search_stream(query, engines, max_results):
+            merge.add(engine_name, results)
+            yield engine_name, merge.top()
+    
+    async def acombi_fetch_stream(self, query: str, engines: Optional[List[str]] = None,
+                                  max_results: int = 10) -> AsyncIterator[Tuple[str, List[SearchResult]]]:
+        """Async variant of combi_fetch_stream"""
+        merge = RankedMerge(max_results, self.fusion_method)
+        async for engine_name, results in self.asearch_stream(query, engines, max_results):
+            merge.add(engine_name, results)
+            yield engine_name, merge.top()
     
-    def folder_fetch(self, query: str, folder_path: str, max_results: int = 10) -> List[SearchResult]:
-        """Search through local files in a folder"""
+    def folder_fetch(self, query: str, folder_path: str, max_results: int = 10, use_index: bool = True,
+                     max_wait: float = 0.0, max_file_size: Optional[int] = None) -> List[SearchResult]:
+        """Search through local files in a folder.
+
+        Plain word queries use the folder index when ``use_index`` is set, unless a
+        word is too short or too common for it; phrases, OR/NOT and regexes (see
+        local_query) always run as a single-pass scan.
+        Unwatched indexes are refreshed before every query. Watched ones (see
+        watch_folder) are queried as they are, unless ``max_wait`` allows waiting
+        up to that many seconds for pending changes to be applied.
+        ``max_file_size`` skips every file larger than that many bytes (0 for no
+        limit). Without it, bundle-like files over 2 MB are skipped, or an open
+        index keeps the cap it was last given.
+        """
         if not os.path.exists(folder_path):
             return []
         
-        results = []
-        query_lower = query.lower()
-        
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith(('.txt', '.md', '.py', '.js', '.html', '.css', '.json')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            if query_lower in content.lower():
-                                # Calculate relevance score
-                                content_lower = content.lower()
-                                relevance = content_lower.count(query_lower) / len(content_lower) * 100
-                                
-                                # Extract snippet
-                                start_pos = content_lower.find(query_lower)
-                                snippet_start = max(0, start_pos - 100)
-                                snippet_end = min(len(content), start_pos + len(query_lower) + 100)
-                                snippet = content[snippet_start:snippet_end]
-                                
-                                result = SearchResult(
-                                    title=f"File: {file}",
-                                    url=f"file://{file_path}",
-                                    snippet=snippet,
-                                    source='Local Files',
-                                    relevance_score=min(relevance, 1.0)
-                                )
-                                results.append(result)
-                    except Exception as e:
-                        logger.error(f"Error reading file {file_path}: {e}")
-        
-        # Sort by relevance and return top results
-        results.sort(key=lambda x: x.relevance_score, reverse=True)
-        return results[:max_results]
+        local_query = compile_query(query)
+        if use_index and local_query.is_simple:
+            index = self.get_folder_index(folder_path, max_file_size)
+            watcher = self.folder_watchers.get(index.folder_path)
+            if watcher is None:
+                index.refresh()
+            elif max_wait > 0 and watcher.is_stale:
+                if not watcher.flush(timeout=max_wait):
+                    logger.info(f"Index for {index.folder_path} still catching up, answering from it as is")
+            hits = index.search(query, max_results)
+            for hit in hits or []:
+                hit['snippets'] = [{'text': hit['snippet'], 'highlights': local_query.highlights(hit['snippet'])}]
+        else:
+            hits = None
+        if hits is None:
+            # Not a plain word query, or a word too short or common for the index
+            hits = scan_folder(query, folder_path, max_results, discovery=self._discovery(max_file_size))
+        
+        return [
+            SearchResult(
+                title=f"File: {os.path.basename(hit['path'])}",
+                url=f"file://{hit['path']}",
+                snippet=hit['snippet'],
+                source='Local Files',
+                relevance_score=hit['relevance'],
+                metadata={
+                    'path': hit['path'],
+                    'highlights': hit['snippets'][0]['highlights'] if hit['snippets'] else [],
+                    'snippets': hit['snippets']
+                }
+            )
+            for hit in hits
+        ]
+    
+    @staticmethod
+    def _discovery(max_file_size: Optional[int]) -> Optional[FileDiscovery]:
+        """File selection capping every file at max_file_size, or None for the default"""
+        if max_file_size is None:
+            return None
+        return FileDiscovery(extensions=INDEXED_EXTENSIONS, max_file_size=max_file_size, size_capped_extensions=None)
+    
+    def get_folder_index(self, folder_path: str, max_file_size: Optional[int] = None) -> FolderIndex:
+        """Get (or open) the persistent index for a folder.
+        
+        ``max_file_size`` as in folder_fetch; changing it on an open index takes
+        effect with its next refresh.
+        """
+        key = os.path.abspath(folder_path)
+        discovery = self._discovery(max_file_size)
+        with self._index_lock:
+            index = self.folder_indexes.get(key)
+            if index is None:
+                index = self.folder_indexes[key] = FolderIndex(key, discovery=discovery)
+            elif discovery is not None and (index.discovery.max_file_size, index.discovery.size_capped_extensions) != (max_file_size, None):
+                index.discovery = discovery
+                watcher = self.folder_watchers.get(key)
+                if watcher is not None:
+                    # Files on either side of the new cap must be added or dropped
+                    watcher.notify([key])
+            return index
+    
+    def watch_folder(self, folder_path: str, debounce: float = 0.5, sweep_interval: float = 30.0) -> FolderWatcher:
+        """Keep a folder's index current in the background so queries skip the refresh walk"""
+        index = self.get_folder_index(folder_path)
+        with self._index_lock:
+            watcher = self.folder_watchers.get(index.folder_path)
+            if watcher is None:
+                watcher = FolderWatcher(index, debounce=debounce, sweep_interval=sweep_interval).start()
+                self.folder_watchers[index.folder_path] = watcher
+            return watcher
+    
+    def unwatch_folder(self, folder_path: str):
+        with self._index_lock:
+            watcher = self.folder_watchers.pop(os.path.abspath(folder_path), None)
+        if watcher is not None:
+            watcher.stop()
+    
+    def get_index_staleness(self, folder_path: str) -> Optional[Dict[str, Any]]:
+        """Staleness of a watched folder's index, or None if the folder is not watched"""
+        watcher = self.folder_watchers.get(os.path.abspath(folder_path))
+        return watcher.staleness() if watcher is not None else None
     
     def get_search_history(self) -> List[Dict[str, Any]]:
         """Get search history"""
@@ -435,28 +1727,72 @@ class AdvancedSearchEngine:
     
     def clear_cache(self):
         """Clear search cache"""
-        self.cache.cache.clear()
-        self.cache.save_cache()
+        self.cache.clear()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get search cache hit rate and size"""
+        stats = self.cache.stats()
+        stats['coalesced_requests'] = self.coalesced_requests
+        return stats
     
-    def get_engine_status(self) -> Dict[str, bool]:
-        """Check status of all search engines"""
+    def close(self):
+        """Stop folder watchers, close the shared HTTP session and stop the search loop"""
+        with self._index_lock:
+            watchers, self.folder_watchers = list(self.folder_watchers.values()), {}
+        for watcher in watchers:
+            watcher.stop()
+        if self._loop is None:
+            return
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        if self._session is not None:
+            self._run_sync(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        self._session = None
+    
+    def get_engine_status(self) -> Dict[str, Dict[str, Any]]:
+        """Cached status of all search engines, derived from recent requests and background probes"""
         status = {}
         for engine_name, engine in self.engines.items():
-            try:
-                # Simple test query
-                test_results = engine.search("test", 1)
-                status[engine_name] = len(test_results) >= 0
-            except Exception as e:
-                logger.error(f"Engine {engine_name} test failed: {e}")
-                status[engine_name] = False
+            breaker = self.breakers[engine_name]
+            health = self.health[engine_name].snapshot()
+            success_rate = health['success_rate']
+            health['available'] = breaker.state != CircuitBreaker.OPEN and (success_rate is None or success_rate >= 0.5)
+            health['breaker'] = breaker.status()
+            health['rate_limiter'] = engine.rate_limiter.status()
+            status[engine_name] = health
         return status
+    
+    def refresh_engine_status(self) -> Dict[str, Dict[str, Any]]:
+        """Probe every engine that has a cheap probe now (concurrently) and return the updated status"""
+        self._run_sync(self._probe_engines(force=True))
+        return self.get_engine_status()
+
+# Global search engine instance, created on first use so importing this module
+# opens no cache files and starts no threads
+_search_engine = None
+_search_engine_lock = threading.Lock()
+
+def get_search_engine() -> AdvancedSearchEngine:
+    """The shared AdvancedSearchEngine"""
+    global _search_engine
+    with _search_engine_lock:
+        if _search_engine is None:
+            _search_engine = AdvancedSearchEngine()
+        return _search_engine
 
-# Global search engine instance
-search_engine = AdvancedSearchEngine()
+def __getattr__(name: str) -> Any:
+    # Keeps `from advanced_search_engine import search_engine` working
+    if name == 'search_engine':
+        return get_search_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # Test the search engine
     print("Testing Advanced Search Engine...")
+    search_engine = get_search_engine()
     
     # Test basic search
     results = search_engine.search("python async programming", ['brave', 'github'], 5)
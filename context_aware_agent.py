@@ -4,7 +4,7 @@ import json
 import time
 import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Callable
 import hashlib
 import os
 import re
@@ -172,6 +172,9 @@ class ConversationContext:
         self.interaction_count = 0
 
 class ContextAwareAgent:
+    # Intents whose LLM replies are reused when the response cache is enabled
+    CACHEABLE_INTENTS = ('greeting', 'gratitude', 'farewell')
+    
     def __init__(self, agent_id: str = "context_agent"):
         self.agent_id = agent_id
         self.context = ConversationContext()
@@ -257,14 +260,19 @@ class ContextAwareAgent:
             ]
         }
     
-    def process_message(self, message: str, role: str = "user") -> Dict[str, Any]:
-        """Process incoming message and generate context-aware response"""
+    def process_message(self, message: str, role: str = "user",
+                        on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Process incoming message and generate context-aware response.
+        
+        With ``on_delta``, an LLM response is streamed and each text delta is passed
+        to it as it arrives; the returned content is still the full response.
+        """
         # Add message to context
         self.context.add_message(role, message)
         
         # Analyze message and generate response
         analysis = self._analyze_message(message)
-        response = self._generate_response(analysis)
+        response = self._generate_response(analysis, on_delta)
         
         # Add response to context
         self.context.add_message("assistant", response['content'])
@@ -366,13 +374,14 @@ class ContextAwareAgent:
         
         return None
     
-    def _generate_response(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def _generate_response(self, analysis: Dict[str, Any],
+                           on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """Generate context-aware response using LLM or templates"""
         
         # Try LLM first if available
         if self.llm_enabled and LLM_AVAILABLE:
             try:
-                llm_response = self._generate_llm_response(analysis)
+                llm_response = self._generate_llm_response(analysis, on_delta)
                 if llm_response and llm_response != "Error generating response":
                     self.response_quality['llm_responses'] += 1
                     return {
@@ -400,7 +409,8 @@ class ContextAwareAgent:
             'provider': 'template'
         }
     
-    def _generate_llm_response(self, analysis: Dict[str, Any]) -> str:
+    def _generate_llm_response(self, analysis: Dict[str, Any],
+                               on_delta: Optional[Callable[[str], None]] = None) -> str:
         """Generate response using LLM"""
         if not self.llm_enabled or not LLM_AVAILABLE:
             return ""
@@ -411,10 +421,19 @@ class ContextAwareAgent:
         # Create a natural prompt based on analysis
         prompt = self._build_llm_prompt(analysis, context)
         
+        # Small talk is worth reusing even from a creative model; everything else follows the
+        # response cache's temperature rule
+        cache = True if analysis.get('intent') in self.CACHEABLE_INTENTS else None
+        
         # Generate response using LLM
-        response = llm_manager.generate_response(prompt, context)
+        if on_delta is None:
+            return llm_manager.generate_response(prompt, context, cache=cache)
         
-        return response
+        deltas = []
+        for delta in llm_manager.generate_stream(prompt, context, cache=cache):
+            deltas.append(delta)
+            on_delta(delta)
+        return "".join(deltas)
     
     def _build_llm_prompt(self, analysis: Dict[str, Any], context: Dict[str, Any]) -> str:
         """Build natural language prompt for LLM"""
@@ -515,13 +534,13 @@ class ContextAwareAgent:
         
         return template
     
-    def continue_conversation(self, message: str) -> str:
-        """Continue conversation with context awareness"""
+    def continue_conversation(self, message: str, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Continue conversation with context awareness (streaming deltas to on_delta if given)"""
         if not self.conversation_continuity_enabled:
             return "I'm here to help! What would you like to discuss?"
         
         # Process message and get response
-        result = self.process_message(message)
+        result = self.process_message(message, on_delta=on_delta)
         
         # Add delay for more natural conversation
         if self.response_delay > 0:
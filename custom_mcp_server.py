@@ -10,6 +10,10 @@ import glob
 import shutil
 from typing import Any, Dict, List
 
+from file_discovery import DEFAULT_MAX_FILE_SIZE, FileDiscovery
+from folder_scanner import scan_file
+from local_query import compile_query
+
 MEMORY_FILE = "mcp_custom_memory.json"
 USER_PREFS_FILE = "mcp_user_prefs.json"
 FEEDBACK_FILE = "mcp_feedback.jsonl"
@@ -63,23 +67,27 @@ def fetch_model_config(path: str) -> Dict[str, Any]:
     return file_read(path)
 
 # --- Combined Search ---
-def combined_search(query: str) -> Dict[str, Any]:
-    # Simple: search files and memory for query
-    results = {"files": [], "memory": []}
-    for root, _, files in os.walk("."):
-        for fname in files:
-            try:
-                fpath = os.path.join(root, fname)
-                with open(fpath, "r", encoding="utf-8", errors="ignore") as f:
-                    if query in f.read():
-                        results["files"].append(fpath)
-            except Exception:
-                continue
+def combined_search(query: str, max_file_size: int = DEFAULT_MAX_FILE_SIZE) -> Dict[str, Any]:
+    # Search files and memory; query supports AND/OR/NOT, "phrases" and /regex/ (see local_query)
+    local_query = compile_query(query)
+    results = {"files": [], "matches": [], "memory": []}
+    # Ignored trees (.git, node_modules, .gitignore'd paths) and files over max_file_size
+    # (any extension, 0 for no cap) are skipped; scan_file drops binaries after sniffing their first block
+    discovery = FileDiscovery(max_file_size=max_file_size, size_capped_extensions=None)
+    for fpath, _ in discovery.walk("."):
+        try:
+            # One chunked pass per file finds every pattern with its snippets
+            match = scan_file(fpath, local_query)
+        except Exception:
+            continue
+        if match:
+            results["files"].append(fpath)
+            results["matches"].append({"path": fpath, **match})
     if os.path.exists(MEMORY_FILE):
         with open(MEMORY_FILE, "r", encoding="utf-8") as f:
             memory = json.load(f)
         for k, v in memory.items():
-            if query in str(v):
+            if local_query.match_text(str(v)) is not None:
                 results["memory"].append({"key": k, "value": v})
     return results
 
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+File Discovery: which files local search should look at.
+
+Shared by the folder index, the folder scanner and the MCP server's
+combined_search. Directories are listed with os.scandir and ignored ones are
+pruned before descending, using built-in defaults (.git, __pycache__,
+node_modules, minified bundles, ...) plus any .gitignore files found on the way.
+Bundle-like files (.js, .json, ...) over the size cap are skipped by default;
+readers scan in chunks, so large text files stay searchable. Readers use
+looks_binary() on the first block they read anyway to drop binaries without
+extra I/O.
+"""
+
+import os
+import re
+import logging
+from typing import List, Optional, Tuple, Iterable, Iterator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_FILE_SIZE = 2 * 1024 * 1024
+# Large files of these types are nearly always generated bundles or data dumps
+SIZE_CAPPED_EXTENSIONS = ('.js', '.mjs', '.cjs', '.json', '.css', '.map')
+BINARY_SNIFF_SIZE = 8000
+DEFAULT_IGNORE_PATTERNS = (
+    '.git/', '.hg/', '.svn/',
+    '__pycache__/', '.pytest_cache/', '.mypy_cache/', '.ruff_cache/', '.tox/', '.nox/',
+    '.venv/', 'venv/', '*.egg-info/',
+    'node_modules/', 'bower_components/',
+    'folder_indexes/',
+    '*.min.js', '*.min.css', '*.map',
+)
+
+
+def looks_binary(header: bytes) -> bool:
+    """Git's heuristic: a NUL byte in the first few KB means binary"""
+    return b'\x00' in header[:BINARY_SNIFF_SIZE]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append(f'[{body}]')
+                i = end
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts)
+
+
+class IgnoreRules:
+    """Patterns from one .gitignore (or the defaults), relative to ``base``"""
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        # base is the directory's path relative to the search root, '' or ending in '/'
+        self.base = base
+        self.rules: List[Tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            # A slash anywhere but the end (a leading one included) anchors the pattern
+            # to the .gitignore's directory
+            anchored = '/' in line
+            line = line.lstrip('/')
+            if not line:
+                continue
+            prefix = '' if anchored else '(?:.*/)?'
+            self.rules.append((re.compile(f'^{prefix}{_glob_to_regex(line)}$'), negate, dir_only))
+
+    @classmethod
+    def from_file(cls, base: str, path: str) -> Optional['IgnoreRules']:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return cls(base, f.readlines())
+        except OSError as e:
+            logger.warning(f"Cannot read {path}: {e}")
+            return None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included with '!', None if no rule applies"""
+        if not rel_path.startswith(self.base):
+            return None
+        rel_path = rel_path[len(self.base):]
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+class FileDiscovery:
+    """Walks a folder yielding (path, stat) for the files local search should read.
+
+    ``max_file_size`` applies to files ending in ``size_capped_extensions``, or to
+    every file when that is None; a falsy ``max_file_size`` disables the cap.
+    """
+
+    def __init__(self, extensions: Optional[Tuple[str, ...]] = None,
+                 max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+                 ignore_patterns: Iterable[str] = DEFAULT_IGNORE_PATTERNS,
+                 use_gitignore: bool = True,
+                 size_capped_extensions: Optional[Tuple[str, ...]] = SIZE_CAPPED_EXTENSIONS):
+        self.extensions = extensions
+        self.max_file_size = max_file_size
+        self.size_capped_extensions = size_capped_extensions
+        self.default_rules = IgnoreRules('', ignore_patterns)
+        self.use_gitignore = use_gitignore
+        self.skipped_large = 0
+
+    def _with_gitignore(self, rules: List[IgnoreRules], directory: str, rel_dir: str) -> List[IgnoreRules]:
+        if self.use_gitignore:
+            gitignore = os.path.join(directory, '.gitignore')
+            if os.path.isfile(gitignore):
+                extra = IgnoreRules.from_file(rel_dir, gitignore)
+                if extra and extra.rules:
+                    return rules + [extra]
+        return rules
+
+    @staticmethod
+    def _is_ignored(rules: List[IgnoreRules], rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for rule_set in rules:
+            result = rule_set.match(rel_path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def _accept_file(self, name: str, rel_path: str, rules: List[IgnoreRules],
+                     stat: os.stat_result) -> bool:
+        if self.extensions and not name.endswith(self.extensions):
+            return False
+        if self._is_ignored(rules, rel_path, False):
+            return False
+        if (self.max_file_size and stat.st_size > self.max_file_size
+                and (self.size_capped_extensions is None or name.endswith(self.size_capped_extensions))):
+            self.skipped_large += 1
+            return False
+        return True
+
+    def walk(self, root: str, start: Optional[str] = None) -> Iterator[Tuple[str, os.stat_result]]:
+        """Yield accepted files under root, or only under ``start`` (a file or directory inside root)"""
+        rules = [self.default_rules]
+        directory, rel_dir = root, ''
+        if start is not None:
+            rel_start = os.path.relpath(start, root)
+            if rel_start.startswith(os.pardir):
+                return
+            components = [] if rel_start == os.curdir else rel_start.split(os.sep)
+            # Apply the ignore rules of every ancestor between root and start
+            for i, name in enumerate(components):
+                rules = self._with_gitignore(rules, directory, rel_dir)
+                is_last = i == len(components) - 1
+                path = os.path.join(directory, name)
+                is_dir = os.path.isdir(path)
+                if self._is_ignored(rules, rel_dir + name, is_dir):
+                    return
+                if is_last and not is_dir:
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        return
+                    if os.path.isfile(path) and self._accept_file(name, rel_dir + name, rules, stat):
+                        yield path, stat
+                    return
+                directory, rel_dir = path, rel_dir + name + '/'
+
+        stack = [(directory, rel_dir, rules)]
+        while stack:
+            directory, rel_dir, rules = stack.pop()
+            rules = self._with_gitignore(rules, directory, rel_dir)
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Pruned here, so ignored trees are never listed
+                        if not self._is_ignored(rules, rel_path, True):
+                            stack.append((entry.path, rel_path + '/', rules))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    if self.extensions and not entry.name.endswith(self.extensions):
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if self._accept_file(entry.name, rel_path, rules, stat):
+                    yield entry.path, stat
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Folder Index: persistent inverted index for local file search.
+
+Each indexed folder gets its own SQLite database holding a postings list per
+term (token positions and character offsets) plus the path, mtime and size of
+every indexed file. A refresh only re-reads files whose mtime or size changed
+since the last run, and a lookup only touches the postings of the query terms.
+Which files are indexed is decided by file_discovery (ignore rules, size cap);
+binary files are recorded without postings so they are not re-read every refresh.
+
+A query follows local_query's rules for plain word lists: every word must occur
+in the file, as a substring of one of its tokens. Those tokens are found through
+a trigram table over the vocabulary; words too short for it, or contained in too
+many terms, are left to the scan (search() returns None). Files are ranked with BM25. Term frequencies, document frequencies, document
+lengths and corpus totals are maintained at index time, so a search only sums
+per-term contributions (vectorized with NumPy when installed).
+"""
+
+import io
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import time
+import heapq
+import math
+import logging
+from array import array
+from itertools import chain
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from file_discovery import FileDiscovery, BINARY_SNIFF_SIZE, looks_binary
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEXED_EXTENSIONS = ('.txt', '.md', '.py', '.js', '.html', '.css', '.json')
+TOKEN_PATTERN = re.compile(r'\w+')
+INDEX_SCHEMA_VERSION = 3
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# A query word may match at most this many indexed terms; less selective words are scanned for
+MAX_TERM_EXPANSIONS = 64
+GRAM_SIZE = 3
+# Below this many postings plain Python scoring beats array set-up
+VECTORIZE_MIN_POSTINGS = 256
+# Per-term postings kept in memory between refreshes
+POSTINGS_CACHE_TERMS = 256
+
+
+def tokenize(text: str) -> List[Tuple[str, int]]:
+    """Split text into lowercase (term, char_offset) pairs"""
+    return [(match.group().lower(), match.start()) for match in TOKEN_PATTERN.finditer(text)]
+
+
+def grams(term: str) -> List[str]:
+    return list({term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)})
+
+
+class FolderIndex:
+    """On-disk inverted index for one folder"""
+
+    def __init__(self, folder_path: str, index_dir: str = "folder_indexes",
+                 extensions: Tuple[str, ...] = INDEXED_EXTENSIONS,
+                 discovery: Optional[FileDiscovery] = None):
+        self.folder_path = os.path.abspath(folder_path)
+        self.extensions = extensions
+        self.discovery = discovery or FileDiscovery(extensions=extensions)
+        os.makedirs(index_dir, exist_ok=True)
+        folder_hash = hashlib.md5(self.folder_path.encode()).hexdigest()
+        self.index_file = os.path.join(index_dir, f"{folder_hash}.db")
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        # (doc_ids, tfs) per term and a doc_id -> length table, dropped whenever the index changes
+        self._postings_cache = OrderedDict()
+        self._doc_lengths = None
+        self.last_refresh = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.index_file, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_SCHEMA_VERSION:
+            # Older indexes lack term statistics; rebuild from scratch on the next refresh
+            for table in ('postings', 'files', 'terms', 'term_grams', 'corpus'):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.execute(f"PRAGMA user_version = {INDEX_SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "doc_id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, "
+            "mtime REAL NOT NULL, size INTEGER NOT NULL, "
+            "length INTEGER NOT NULL, chars INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, doc_id INTEGER NOT NULL, tf INTEGER NOT NULL, positions BLOB NOT NULL, "
+            "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id)")
+        # Document frequency per term and corpus totals, kept current by refresh()
+        conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+        # Trigrams of every indexed term, so substring lookups only touch terms sharing them
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS term_grams (gram TEXT NOT NULL, term TEXT NOT NULL, "
+            "PRIMARY KEY (gram, term)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS corpus (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+        return conn
+
+    def _discover_files(self, roots: Optional[List[str]] = None) -> Dict[str, os.stat_result]:
+        if roots is None:
+            return dict(self.discovery.walk(self.folder_path))
+        files = {}
+        for start in roots:
+            # Changed files or directories reported by a watcher
+            files.update(self.discovery.walk(self.folder_path, start))
+        return files
+
+    def _indexed_files(self, roots: Optional[List[str]] = None) -> Dict[str, Tuple[int, float, int]]:
+        """Map path -> (doc_id, mtime, size) for indexed files, optionally only those under roots"""
+        if roots is None:
+            rows = self.conn.execute("SELECT doc_id, path, mtime, size FROM files")
+            return {path: (doc_id, mtime, size) for doc_id, path, mtime, size in rows}
+        indexed = {}
+        for root in roots:
+            prefix = root.rstrip(os.sep) + os.sep
+            rows = self.conn.execute(
+                "SELECT doc_id, path, mtime, size FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, prefix, prefix + '\uffff')
+            )
+            indexed.update((path, (doc_id, mtime, size)) for doc_id, path, mtime, size in rows)
+        return indexed
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Re-index files changed since the last refresh and drop deleted ones.
+
+        ``paths`` limits the check to those files and directories (as reported by
+        a watcher) instead of walking the whole folder.
+        """
+        roots = None
+        if paths is not None:
+            roots = [
+                path for path in (os.path.abspath(path) for path in paths)
+                if path == self.folder_path or path.startswith(self.folder_path.rstrip(os.sep) + os.sep)
+            ]
+        on_disk = self._discover_files(roots)
+        with self.lock:
+            indexed = self._indexed_files(roots)
+            stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+            # Document frequency changes are summed here and written once per refresh
+            df_changes = Counter()
+
+            self.conn.execute("BEGIN")
+            try:
+                for path, (doc_id, _, _) in indexed.items():
+                    if path not in on_disk:
+                        self._remove_document(doc_id, df_changes)
+                        stats['removed'] += 1
+
+                for path, stat in on_disk.items():
+                    previous = indexed.get(path)
+                    if previous and previous[1] == stat.st_mtime and previous[2] == stat.st_size:
+                        stats['unchanged'] += 1
+                        continue
+                    if previous:
+                        self._remove_document(previous[0], df_changes)
+                    if self._index_document(path, stat, df_changes):
+                        stats['updated' if previous else 'added'] += 1
+
+                if stats['added'] or stats['updated'] or stats['removed']:
+                    self.conn.executemany(
+                        "INSERT INTO terms (term, df) VALUES (?, ?) "
+                        "ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                        ((term, change) for term, change in df_changes.items() if change)
+                    )
+                    gone = [term for term, in self.conn.execute("SELECT term FROM terms WHERE df <= 0")]
+                    self.conn.executemany(
+                        "DELETE FROM term_grams WHERE gram = ? AND term = ?",
+                        ((gram, term) for term in gone for gram in grams(term))
+                    )
+                    self.conn.execute("DELETE FROM terms WHERE df <= 0")
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO term_grams (gram, term) VALUES (?, ?)",
+                        ((gram, term) for term, change in df_changes.items() if change > 0 for gram in grams(term))
+                    )
+                    self._postings_cache.clear()
+                    self._doc_lengths = None
+                    doc_count, total_length = self.conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM files WHERE length > 0"
+                    ).fetchone()
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO corpus (key, value) VALUES (?, ?)",
+                        (('doc_count', doc_count), ('total_length', total_length))
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if roots is None:
+                self.last_refresh = time.time()
+
+        if stats['added'] or stats['updated'] or stats['removed']:
+            logger.info(f"Refreshed index for {self.folder_path}: {stats}")
+        return stats
+
+    def _remove_document(self, doc_id: int, df_changes: Counter):
+        df_changes.subtract(term for term, in self.conn.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,)))
+        self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM files WHERE doc_id = ?", (doc_id,))
+
+    def _index_document(self, path: str, stat: os.stat_result, df_changes: Counter) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                if looks_binary(f.read(BINARY_SNIFF_SIZE)):
+                    content = ''
+                else:
+                    f.seek(0)
+                    content = io.TextIOWrapper(f, encoding='utf-8', errors='ignore').read()
+        except Exception as e:
+            logger.error(f"Error reading file {path}: {e}")
+            return False
+
+        tokens = tokenize(content)
+        cursor = self.conn.execute(
+            "INSERT INTO files (path, mtime, size, length, chars) VALUES (?, ?, ?, ?, ?)",
+            (path, stat.st_mtime, stat.st_size, len(tokens), len(content))
+        )
+        doc_id = cursor.lastrowid
+
+        # Postings store interleaved (token_index, char_offset) pairs
+        positions = {}
+        for token_index, (term, char_offset) in enumerate(tokens):
+            positions.setdefault(term, array('I')).extend((token_index, char_offset))
+        self.conn.executemany(
+            "INSERT INTO postings (term, doc_id, tf, positions) VALUES (?, ?, ?, ?)",
+            ((term, doc_id, len(offsets) // 2, offsets.tobytes()) for term, offsets in positions.items())
+        )
+        df_changes.update(positions.keys())
+        return True
+
+    def _expand_terms(self, query: str) -> Optional[List[List[Tuple[str, int]]]]:
+        """Group the indexed (term, df) pairs containing each query term.
+
+        Matching substrings of terms ("sync" finds "asyncio") gives the same files
+        as local_query's substring scan. Returns [] if some query term occurs in
+        no indexed term (so no file can match), and None if one is shorter than a
+        trigram or occurs in more than MAX_TERM_EXPANSIONS terms.
+        """
+        terms = list(dict.fromkeys(term for term, _ in tokenize(query)))
+        groups = []
+        for term in terms:
+            term_grams = grams(term)
+            if not term_grams:
+                return None
+            # Candidates share every trigram of the term; instr drops the false positives
+            candidates = " INTERSECT ".join("SELECT term FROM term_grams WHERE gram = ?" for _ in term_grams)
+            rows = self.conn.execute(
+                f"SELECT term, df FROM terms WHERE term IN ({candidates}) AND instr(term, ?) > 0 LIMIT ?",
+                (*term_grams, term, MAX_TERM_EXPANSIONS + 1)
+            ).fetchall()
+            if len(rows) > MAX_TERM_EXPANSIONS:
+                return None
+            if not rows:
+                return []
+            groups.append(rows)
+        return groups
+
+    @staticmethod
+    def _restrict(postings: List[Tuple[float, Any, Any]], candidates: Any) -> List[Tuple[float, Any, Any]]:
+        """Drop the postings of documents outside candidates"""
+        if np is not None:
+            restricted = []
+            for idf, doc_ids, tfs in postings:
+                keep = np.isin(doc_ids, candidates)
+                restricted.append((idf, doc_ids[keep], tfs[keep]))
+            return restricted
+        return [
+            (idf, [doc_id for doc_id in doc_ids if doc_id in candidates],
+             [tf for doc_id, tf in zip(doc_ids, tfs) if doc_id in candidates])
+            for idf, doc_ids, tfs in postings
+        ]
+
+    def _corpus_stats(self) -> Tuple[int, float]:
+        values = dict(self.conn.execute("SELECT key, value FROM corpus"))
+        doc_count = int(values.get('doc_count', 0))
+        return doc_count, values.get('total_length', 0.0) / doc_count if doc_count else 0.0
+
+    def _load_postings(self, term: str) -> Tuple[Any, Any]:
+        """(doc_ids, tfs) for one term, as NumPy arrays when available"""
+        cached = self._postings_cache.get(term)
+        if cached is not None:
+            self._postings_cache.move_to_end(term)
+            return cached
+        rows = self.conn.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+        if np is not None:
+            flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+            postings = (flat[:, 0], flat[:, 1].astype(np.float64))
+        else:
+            postings = ([doc_id for doc_id, _ in rows], [tf for _, tf in rows])
+        self._postings_cache[term] = postings
+        if len(self._postings_cache) > POSTINGS_CACHE_TERMS:
+            self._postings_cache.popitem(last=False)
+        return postings
+
+    def _load_doc_lengths(self) -> Any:
+        """Token count of every document, indexed by doc_id"""
+        if self._doc_lengths is None:
+            rows = self.conn.execute("SELECT doc_id, length FROM files").fetchall()
+            size = max((doc_id for doc_id, _ in rows), default=0) + 1
+            lengths = np.zeros(size, dtype=np.float64) if np is not None else [0] * size
+            for doc_id, length in rows:
+                lengths[doc_id] = length
+            self._doc_lengths = lengths
+        return self._doc_lengths
+
+    def _rank(self, postings: List[Tuple[float, Any, Any]], avg_length: float,
+              max_results: int) -> List[Tuple[float, int]]:
+        """Sum BM25 contributions per document and return the top (score, doc_id) pairs.
+
+        ``postings`` holds (idf, doc_ids, tfs) per indexed term.
+        """
+        lengths = self._load_doc_lengths()
+        avg_length = avg_length or 1.0
+        total = sum(len(doc_ids) for _, doc_ids, _ in postings)
+
+        if np is not None and total >= VECTORIZE_MIN_POSTINGS:
+            scores = np.zeros(len(lengths), dtype=np.float64)
+            for idf, doc_ids, tfs in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_ids] / avg_length)
+                scores += np.bincount(doc_ids, weights=idf * tfs * (BM25_K1 + 1) / (tfs + norm),
+                                      minlength=len(scores))
+            if len(scores) > max_results:
+                top = np.argpartition(-scores, max_results - 1)[:max_results]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [(float(scores[doc_id]), int(doc_id)) for doc_id in top if scores[doc_id] > 0]
+
+        scores = {}
+        for idf, doc_ids, tfs in postings:
+            for doc_id, tf in zip(doc_ids, tfs):
+                doc_id, tf = int(doc_id), float(tf)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * float(lengths[doc_id]) / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return [(score, doc_id) for doc_id, score in heapq.nlargest(max_results, scores.items(), key=lambda item: item[1])]
+
+    def search(self, query: str, max_results: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Return the best files (BM25) containing every query term, as dicts with
+        path, relevance, score and snippet; None if the query is not selective
+        enough for the index (see _expand_terms) and should be scanned for"""
+        if max_results <= 0:
+            return []
+        with self.lock:
+            groups = self._expand_terms(query)
+            if not groups:
+                return groups
+            doc_count, avg_length = self._corpus_stats()
+
+            idfs = {}
+            postings = []
+            candidates = None
+            for group in groups:
+                group_postings = []
+                for term, df in group:
+                    idfs[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                    group_postings.append((idfs[term], *self._load_postings(term)))
+                # Documents containing this query term in any of its expansions
+                if np is not None:
+                    docs = np.unique(np.concatenate([doc_ids for _, doc_ids, _ in group_postings]))
+                    candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+                else:
+                    docs = set(chain.from_iterable(doc_ids for _, doc_ids, _ in group_postings))
+                    candidates = docs if candidates is None else candidates & docs
+                postings.extend(group_postings)
+            if len(groups) > 1:
+                postings = self._restrict(postings, candidates)
+            ranked = self._rank(postings, avg_length, max_results)
+
+            hits = []
+            for score, doc_id in ranked:
+                path = self.conn.execute("SELECT path FROM files WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+                # Snippet around the first occurrence of the rarest matching term
+                term, blob = max(
+                    self.conn.execute(
+                        f"SELECT term, positions FROM postings WHERE doc_id = ? AND term IN ({','.join('?' * len(idfs))})",
+                        (doc_id, *idfs)
+                    ),
+                    key=lambda row: idfs[row[0]]
+                )
+                offsets = array('I')
+                offsets.frombytes(blob[:8])
+                hits.append((score, path, offsets[1], len(term)))
+
+        # Scale by the score a document would approach with every query term repeated endlessly
+        best_possible = sum(max(idfs[term] for term, _ in group) for group in groups) * (BM25_K1 + 1)
+        return [
+            {
+                'path': path,
+                'relevance': min(score / best_possible, 1.0) if best_possible else 0.0,
+                'score': score,
+                'snippet': self._read_snippet(path, offset, length)
+            }
+            for score, path, offset, length in hits
+        ]
+
+    def _read_snippet(self, path: str, offset: int, length: int) -> str:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read(offset + length + 100)
+        except Exception as e:
+            logger.error(f"Error reading file {path}: {e}")
+            return ""
+        return content[max(0, offset - 100):offset + length + 100]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            files = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            postings = self.conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+            terms = self.conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+            _, avg_length = self._corpus_stats()
+        return {
+            'folder': self.folder_path,
+            'index_file': self.index_file,
+            'files': files,
+            'postings': postings,
+            'terms': terms,
+            'avg_doc_length': round(avg_length, 1),
+            'last_refresh': self.last_refresh
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Folder Scanner: parallel, memory-bounded query search over a folder.
+
+Used by folder_fetch when no index should be built (one-off folders, or before
+the first index exists) and for queries the index cannot answer (phrases, OR,
+NOT, regexes - see local_query). Files come from file_discovery (ignore rules
+and size cap), are spread across a process pool in batches and read in
+fixed-size chunks, every query pattern is found in a single pass and only the
+current top ``max_results`` hits are kept, so memory does not grow with the tree.
+"""
+
+import os
+import codecs
+import heapq
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Any, Tuple, Iterator
+
+from file_discovery import FileDiscovery, looks_binary
+from folder_index import INDEXED_EXTENSIONS
+from local_query import LocalQuery, compile_query
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 64
+SNIPPET_CONTEXT = 100
+MAX_SNIPPETS = 3
+MAX_HIGHLIGHTS = 20
+
+
+def _find_literal(text: str, needle: str, start: int) -> Iterator[Tuple[int, int, int]]:
+    position = text.find(needle, start)
+    while position >= 0:
+        yield position, position + len(needle), 0
+        position = text.find(needle, position + 1)
+
+
+def scan_file(path: str, query: LocalQuery, chunk_size: int = CHUNK_SIZE,
+              max_snippets: int = MAX_SNIPPETS) -> Optional[Dict[str, Any]]:
+    """Find every query pattern in one pass over the file.
+
+    Returns None when the file does not satisfy the query or its first block
+    looks binary, otherwise a dict with
+    relevance, per-pattern match counts and up to max_snippets snippets with
+    highlight offsets. Only one chunk plus a short overlap is held in memory.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    # A single literal is counted with str.count and only located until the snippets are filled
+    needle = query.patterns[0][1] if len(query.patterns) == 1 and query.patterns[0][0] != 'regex' else None
+    lowercase = query.needs_lowercase() or needle is not None
+    overlap = query.max_span + SNIPPET_CONTEXT
+    carry, carry_lower = '', ''
+    carry_start = 0
+    counts = [0] * len(query.patterns)
+    total_chars = 0
+    # Snippets use absolute character offsets until the file is done
+    snippets = []
+
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(chunk_size)
+            if not total_chars and looks_binary(block):
+                return None
+            text = decoder.decode(block, final=not block)
+            total_chars += len(text)
+            for snippet in snippets:
+                missing = snippet['end'] - snippet['start'] - len(snippet['text'])
+                if missing > 0:
+                    snippet['text'] += text[:missing]
+
+            window = carry + text
+            window_lower = carry_lower + text.lower() if lowercase else None
+            if needle is not None:
+                first = max(0, len(carry) - len(needle) + 1)
+                counts[0] += window_lower.count(needle, first)
+                matches = _find_literal(window_lower, needle, first)
+            else:
+                matches = query.finditer(window, window_lower)
+            for start, end, pattern_id in matches:
+                # Matches ending inside the carry were already seen with the previous window
+                if end <= len(carry):
+                    continue
+                if needle is None:
+                    counts[pattern_id] += 1
+                start, end = carry_start + start, carry_start + end
+                if snippets and start < snippets[-1]['end']:
+                    if len(snippets[-1]['highlights']) < MAX_HIGHLIGHTS:
+                        snippets[-1]['highlights'].append((start, min(end, snippets[-1]['end'])))
+                elif len(snippets) < max_snippets:
+                    snippet_start = max(carry_start, start - SNIPPET_CONTEXT)
+                    snippets.append({
+                        'start': snippet_start,
+                        'end': end + SNIPPET_CONTEXT,
+                        'text': window[snippet_start - carry_start:end + SNIPPET_CONTEXT - carry_start],
+                        'highlights': [(start, end)]
+                    })
+                elif needle is not None:
+                    break
+
+            if not block:
+                break
+            carry_start += max(0, len(window) - overlap)
+            carry = window[-overlap:]
+            if lowercase:
+                carry_lower = window_lower[-overlap:]
+
+    if not query.evaluate({pattern_id for pattern_id, count in enumerate(counts) if count}):
+        return None
+    return {
+        'relevance': min(sum(counts) / max(total_chars, 1) * 100, 1.0),
+        'match_counts': {source: count for (_, source), count in zip(query.patterns, counts) if count},
+        'snippets': [
+            {
+                'text': snippet['text'],
+                'highlights': [(start - snippet['start'], end - snippet['start']) for start, end in snippet['highlights']]
+            }
+            for snippet in snippets
+        ]
+    }
+
+
+def scan_batch(paths: List[str], query_text: str, max_results: int) -> List[Tuple[float, str, Dict[str, Any]]]:
+    """Scan a batch of files and keep only the batch's top hits"""
+    query = compile_query(query_text)
+    top = []
+    for path in paths:
+        try:
+            match = scan_file(path, query)
+        except Exception as e:
+            logger.error(f"Error reading file {path}: {e}")
+            continue
+        if match:
+            item = (match['relevance'], path, match)
+            if len(top) < max_results:
+                heapq.heappush(top, item)
+            else:
+                heapq.heappushpop(top, item)
+    return top
+
+
+def iter_batches(folder_path: str, discovery: FileDiscovery, batch_size: int) -> Iterator[List[str]]:
+    batch = []
+    for path, _ in discovery.walk(folder_path):
+        batch.append(path)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def scan_folder(query: str, folder_path: str, max_results: int = 10,
+                extensions: Tuple[str, ...] = INDEXED_EXTENSIONS,
+                workers: Optional[int] = None,
+                discovery: Optional[FileDiscovery] = None) -> List[Dict[str, Any]]:
+    """Return the top matching files as dicts with path, relevance, snippet(s) and match counts"""
+    if compile_query(query).root is None:
+        return []
+
+    top = []
+
+    def merge(hits: List[Tuple[float, str, Dict[str, Any]]]):
+        for item in hits:
+            if len(top) < max_results:
+                heapq.heappush(top, item)
+            else:
+                heapq.heappushpop(top, item)
+
+    batches = iter_batches(folder_path, discovery or FileDiscovery(extensions=extensions), BATCH_SIZE)
+    first = next(batches, None)
+    if first is None:
+        return []
+    second = next(batches, None)
+
+    if second is None:
+        # Small folder: not worth starting a process pool
+        merge(scan_batch(first, query, max_results))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = {
+                executor.submit(scan_batch, first, query, max_results),
+                executor.submit(scan_batch, second, query, max_results)
+            }
+            # Bound the number of queued batches so the walk never runs far ahead of the workers
+            for batch in batches:
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merge(future.result())
+                in_flight.add(executor.submit(scan_batch, batch, query, max_results))
+            for future in in_flight:
+                merge(future.result())
+
+    return [
+        {
+            'path': path,
+            'relevance': relevance,
+            'snippet': match['snippets'][0]['text'] if match['snippets'] else '',
+            'snippets': match['snippets'],
+            'match_counts': match['match_counts']
+        }
+        for relevance, path, match in sorted(top, key=lambda item: (item[0], item[1]), reverse=True)
+    ]
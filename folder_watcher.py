@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Folder Watcher: keeps a folder index current as files change.
+
+Uses watchdog (inotify on Linux, FSEvents / ReadDirectoryChangesW elsewhere)
+when it is installed, otherwise a periodic background sweep that re-stats the
+folder. Bursts of change events are collected and debounced into one refresh of
+just the changed paths, so folder_fetch can query a watched index without
+walking the tree first and can check how stale the index may be.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Any, Iterable, Set
+
+from folder_index import FolderIndex
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """Forwards watchdog events for indexable files and directories to the watcher"""
+
+    def __init__(self, watcher: 'FolderWatcher'):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        # Directory 'modified' events only mean the listing changed; the file events cover it
+        if event.is_directory and event.event_type == 'modified':
+            return
+        paths = [event.src_path]
+        if getattr(event, 'dest_path', None):
+            paths.append(event.dest_path)
+        extensions = self.watcher.index.extensions
+        paths = [
+            # Changed ignore rules can add or drop any file below the .gitignore
+            os.path.dirname(path) if os.path.basename(path) == '.gitignore' else path
+            for path in paths
+            if event.is_directory or path.endswith(extensions) or os.path.basename(path) == '.gitignore'
+        ]
+        if paths:
+            self.watcher.notify(paths)
+
+
+class FolderWatcher:
+    """Background thread that applies file changes to one FolderIndex.
+
+    Changes are applied once no new event arrived for ``debounce`` seconds, or at
+    the latest ``max_delay`` seconds after the first pending change. Without
+    watchdog the whole folder is re-checked every ``sweep_interval`` seconds.
+    A refresh that fails is retried ``max_delay`` seconds later, and the index
+    counts as stale until one succeeds.
+    """
+
+    def __init__(self, index: FolderIndex, debounce: float = 0.5, max_delay: float = 5.0,
+                 sweep_interval: float = 30.0, use_native: bool = True):
+        self.index = index
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.sweep_interval = sweep_interval
+        self.mode = 'native' if use_native and Observer is not None else 'sweep'
+        self.events = 0
+        self.syncs = 0
+        self.last_sync = None
+        self.last_sync_stats = None
+        self.last_error = None
+
+        self._condition = threading.Condition()
+        self._pending: Set[str] = set()
+        self._first_change = None
+        self._last_change = None
+        # Oldest change in the batch currently being applied
+        self._applying_since = None
+        self._syncing = False
+        self._flush_requested = False
+        self._last_sweep_start = None
+        # After a failed refresh: no retry before _retry_at; a failed full refresh is
+        # redone as a sweep, missing changes since _failed_since
+        self._retry_at = None
+        self._retry_sweep = False
+        self._failed_since = None
+        self._stopped = False
+        self._observer = None
+        self._thread = None
+
+    def start(self) -> 'FolderWatcher':
+        if self.mode == 'native':
+            try:
+                observer = Observer()
+                observer.schedule(_ChangeHandler(self), self.index.folder_path, recursive=True)
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                logger.warning(f"Cannot watch {self.index.folder_path} natively ({e}), using periodic sweeps")
+                self.mode = 'sweep'
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.index.folder_path} ({self.mode})")
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self, paths: Iterable[str]):
+        """Record changed paths (called by the event handler, or manually)"""
+        with self._condition:
+            now = time.monotonic()
+            before = len(self._pending)
+            self._pending.update(paths)
+            self.events += len(self._pending) - before
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            self._condition.notify_all()
+
+    def _next_due(self, now: float) -> Optional[float]:
+        if self._flush_requested:
+            return now
+        if self._retry_sweep:
+            due = now
+        elif self._pending:
+            due = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+        elif self.mode == 'sweep':
+            due = (self._last_sweep_start or now) + self.sweep_interval
+        else:
+            return None
+        return max(due, self._retry_at) if self._retry_at is not None else due
+
+    def _run(self):
+        # A full refresh first picks up whatever changed while nobody was watching
+        batch = None
+        while True:
+            with self._condition:
+                self._syncing = True
+                self._flush_requested = False
+                if batch is None:
+                    self._last_sweep_start = time.monotonic()
+            self._sync(batch)
+
+            with self._condition:
+                while not self._stopped:
+                    now = time.monotonic()
+                    due = self._next_due(now)
+                    if due is not None and now >= due:
+                        break
+                    self._condition.wait(None if due is None else due - now)
+                if self._stopped:
+                    return
+                if self._pending and not self._retry_sweep:
+                    batch, self._pending = list(self._pending), set()
+                    self._applying_since, self._first_change = self._first_change, None
+                elif self._retry_sweep:
+                    # Redo the failed full refresh; it covers any pending changes too
+                    batch = None
+                    self._applying_since = min(
+                        moment for moment in (self._failed_since, self._first_change) if moment is not None
+                    )
+                    self._pending, self._first_change = set(), None
+                else:
+                    # Sweep (or a flush in sweep mode): re-check the whole folder; until it
+                    # finishes the index reflects the previous sweep
+                    batch = None
+                    self._applying_since = self._last_sweep_start
+
+    def _sync(self, batch: Optional[List[str]]):
+        started = time.monotonic()
+        failed = True
+        try:
+            self.last_sync_stats = self.index.refresh(batch)
+            self.last_error = None
+            failed = False
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error refreshing index for {self.index.folder_path}: {e}")
+        finally:
+            with self._condition:
+                since = self._applying_since if self._applying_since is not None else started
+                if not failed:
+                    self._retry_at = None
+                    if batch is None:
+                        self._retry_sweep = False
+                        self._failed_since = None
+                else:
+                    self._retry_at = time.monotonic() + self.max_delay
+                    if batch is None:
+                        self._retry_sweep = True
+                        self._failed_since = min(since, self._failed_since or since)
+                    else:
+                        # Put the paths back so the next sync retries them
+                        self._pending.update(batch)
+                        self._first_change = min(since, self._first_change or since)
+                        self._last_change = self._last_change or since
+                self._syncing = False
+                self._applying_since = None
+                self.syncs += 1
+                self.last_sync = time.time()
+                self._condition.notify_all()
+
+    @property
+    def is_stale(self) -> bool:
+        """True while changes may not be in the index yet (always possible in sweep mode)"""
+        with self._condition:
+            return self._stale()
+
+    def _stale(self) -> bool:
+        return self.mode == 'sweep' or bool(self._pending) or self._syncing or self._retry_sweep
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Apply pending changes now (a full sweep in sweep mode) and wait; False on timeout"""
+        with self._condition:
+            if self.mode == 'native' and not self._pending and not self._retry_sweep:
+                if not self._syncing:
+                    return True
+                target = self.syncs + 1
+            else:
+                # A sync already running may have started before the latest changes
+                target = self.syncs + 1 + (1 if self._syncing else 0)
+                self._flush_requested = True
+                self._condition.notify_all()
+            return self._condition.wait_for(lambda: self.syncs >= target or self._stopped, timeout)
+
+    def staleness(self) -> Dict[str, Any]:
+        """How far behind the filesystem the index may be"""
+        with self._condition:
+            now = time.monotonic()
+            if self.mode == 'sweep':
+                # Anything since the start of the last completed sweep may be missing
+                oldest = self._applying_since if self._syncing else self._last_sweep_start
+                moments = (oldest, self._failed_since)
+            else:
+                moments = (self._first_change, self._applying_since, self._failed_since)
+            oldest = min((moment for moment in moments if moment is not None), default=None)
+            return {
+                'folder': self.index.folder_path,
+                'mode': self.mode,
+                'stale': self._stale(),
+                'stale_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+                'pending_changes': len(self._pending),
+                'syncing': self._syncing,
+                'syncs': self.syncs,
+                'events': self.events,
+                'last_sync': self.last_sync,
+                'last_sync_stats': self.last_sync_stats,
+                'last_error': self.last_error
+            }
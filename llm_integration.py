@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import os
-from typing import Dict, List, Optional, Any
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import deque, OrderedDict
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Tuple
 import logging
 from abc import ABC, abstractmethod
 import model_validation
@@ -13,23 +21,527 @@ import model_validation
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Streaming calls remembered per provider for time-to-first-token / tokens-per-second stats
+STREAM_STATS_HISTORY = 100
+# Connections kept open per provider; LLMManager sizes this to the concurrency it runs at
+DEFAULT_POOL_SIZE = 4
+# Seconds to establish a connection, and to wait for each read (not the whole generation)
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+REQUEST_STATS_HISTORY = 200
+# Responses generated at or below this temperature are reused unless a caller opts out
+CACHE_MAX_TEMPERATURE = 0.3
+# A cached provider status is trusted this long before it is re-checked in the background
+AVAILABILITY_TTL = 60.0
+# A provider found down is re-checked sooner, so recovery is noticed quickly
+AVAILABILITY_FAILURE_TTL = 10.0
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))]
+
+def _is_outage(error: Exception) -> bool:
+    """Whether a failed call means the provider is unusable, rather than that one request was bad"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout,
+                          aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+    else:
+        response = getattr(error, 'response', None)
+        if response is None:
+            return False
+        status = response.status_code
+    # Rate limits (429) and rejected keys (401/403) say nothing about whether the service is up
+    return status >= 500
+
+class StreamInterrupted(RuntimeError):
+    """A streamed response failed after part of it was delivered; ``partial`` is that part"""
+    
+    def __init__(self, message: str, partial: str):
+        super().__init__(message)
+        self.partial = partial
+
+class ProviderAvailability:
+    """Cached up/down status of one provider.
+    
+    Real calls update it as they succeed or fail. Once the status is older than
+    its TTL, the next read starts a probe in a background thread and returns the
+    cached value meanwhile, so generating a response never waits on a health check.
+    A provider whose ``configured`` check fails (e.g. no API key) is unavailable
+    without being probed.
+    """
+    
+    def __init__(self, name: str, probe: Callable[[], bool], ttl: float = AVAILABILITY_TTL,
+                 failure_ttl: float = AVAILABILITY_FAILURE_TTL, configured: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.probe = probe
+        self.configured = configured
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.available = None  # Unknown until the first probe or call
+        self.checked_at = None
+        self.source = None
+        self.last_error = None
+        self.probes = 0
+        self._lock = threading.Lock()
+        self._probe_thread = None
+    
+    def get(self) -> bool:
+        """Cached status (optimistically True while unknown, if configured); never blocks on the network"""
+        if self.configured is not None and not self.configured():
+            return False
+        with self._lock:
+            if self._expired() and self._probe_thread is None:
+                self._probe_thread = threading.Thread(target=self._background_probe, name=f"{self.name}-probe", daemon=True)
+                self._probe_thread.start()
+            return self.available is not False
+    
+    def _expired(self) -> bool:
+        if self.checked_at is None:
+            return True
+        ttl = self.ttl if self.available else self.failure_ttl
+        return time.monotonic() - self.checked_at >= ttl
+    
+    def refresh(self) -> bool:
+        """Probe now and wait for the answer"""
+        started = time.monotonic()
+        error = None
+        try:
+            available = bool(self.probe())
+        except Exception as e:
+            available, error = False, str(e)
+        self._update(available, 'probe', error, started)
+        return available
+    
+    def _background_probe(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._probe_thread = None
+    
+    def record_success(self):
+        self._update(True, 'call')
+    
+    def record_failure(self, error: Exception):
+        self._update(False, 'call', str(error))
+    
+    def _update(self, available: bool, source: str, error: Optional[str] = None, started: Optional[float] = None):
+        with self._lock:
+            if source == 'probe':
+                self.probes += 1
+                # A real call that finished while the probe ran is more recent evidence
+                if self.checked_at is not None and started is not None and self.checked_at > started:
+                    return
+            if self.available is not None and self.available != available:
+                logger.info(f"{self.name} is now {'available' if available else 'unavailable'} (from {source})")
+            self.available = available
+            self.checked_at = time.monotonic()
+            self.source = source
+            if error:
+                self.last_error = error
+    
+    def status(self) -> Dict[str, Any]:
+        configured = self.configured is None or self.configured()
+        with self._lock:
+            return {
+                'available': self.available if configured else False,
+                'configured': configured,
+                'age_seconds': round(time.monotonic() - self.checked_at, 1) if self.checked_at is not None else None,
+                'source': self.source,
+                'last_error': self.last_error,
+                'probes': self.probes
+            }
+
+def _iter_sse_data(lines: Iterable[bytes]) -> Iterator[str]:
+    """Yield the data payload of each server-sent event"""
+    data = []
+    for line in lines:
+        line = line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith('data:'):
+            value = line[5:]
+            data.append(value[1:] if value.startswith(' ') else value)
+    if data:
+        yield "\n".join(data)
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, Unicode form and whitespace differences do not change a cached response"""
+    return " ".join(unicodedata.normalize('NFKC', prompt).casefold().split())
+
+class LLMResponseCache:
+    """Responses keyed on (provider, model, normalized prompt, context, generation params).
+    
+    An in-memory LRU of ``max_entries`` sits in front of an optional SQLite file
+    (``disk_path``) that survives restarts; entries in both expire after ``ttl``
+    seconds. Only responses generated at temperature <= ``max_temperature`` are
+    stored, unless the caller opts in or out explicitly.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, disk_path: Optional[str] = None,
+                 max_temperature: float = CACHE_MAX_TEMPERATURE, max_disk_entries: int = 5000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.max_disk_entries = max_disk_entries
+        self.memory = OrderedDict()  # key -> (response, latency, expires)
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.latency_saved = 0.0
+        self.conn = None
+        if disk_path:
+            self.conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT, latency REAL, expires REAL, accessed REAL)"
+            )
+            self.conn.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            self.conn.commit()
+    
+    def should_cache(self, provider: 'LLMProvider', opt_in: Optional[bool] = None) -> bool:
+        """Explicit opt_in wins; otherwise only low-temperature generations are reused"""
+        cacheable = opt_in if opt_in is not None else provider.temperature <= self.max_temperature
+        if not cacheable:
+            with self.lock:
+                self.skipped += 1
+        return cacheable
+    
+    def make_key(self, provider: 'LLMProvider', prompt: str, context: Optional[Dict[str, Any]]) -> str:
+        # The request body built for an empty prompt holds the context exactly as the model would
+        # see it plus the generation parameters, so bookkeeping such as timestamps is left out
+        request = provider._build_payload("", context)
+        parts = [provider.name, provider.model_name, normalize_prompt(prompt), request]
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and entry[2] <= now:
+                del self.memory[key]
+                entry = None
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+            elif self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT response, latency, expires FROM responses WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+                if row:
+                    self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self.conn.commit()
+                    entry = tuple(row)
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self.latency_saved += entry[1]
+            return entry[0]
+    
+    def set(self, key: str, response: str, latency: float):
+        """Store a successful response with the time it took to generate"""
+        now = time.time()
+        entry = (response, latency, now + self.ttl)
+        with self.lock:
+            self._remember(key, entry)
+            if self.conn is not None:
+                try:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, latency, expires, accessed) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, response, latency, entry[2], now)
+                    )
+                    self.conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,)
+                    )
+                    self.conn.commit()
+                except Exception as e:
+                    logger.error(f"Error saving LLM response cache entry: {e}")
+    
+    def _remember(self, key: str, entry: Tuple[str, float, float]):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+    
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM responses")
+                self.conn.commit()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            disk_entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.conn else None
+            return {
+                'memory_entries': len(self.memory),
+                'disk_entries': disk_entries,
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'not_cacheable': self.skipped,
+                'latency_saved_seconds': round(self.latency_saved, 3)
+            }
+    
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
     
-    @abstractmethod
+    name = "provider"
+    display_name = "Provider"
+    model_name = ""
+    temperature = 0.7
+    
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, keep_alive: bool = True):
+        self.timeout = (connect_timeout, read_timeout)
+        # keep_alive=False sends "Connection: close", i.e. a new connection (and TLS handshake) per request
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.session = self._create_session(pool_size)
+        self.request_stats = deque(maxlen=REQUEST_STATS_HISTORY)
+        self.stream_stats = deque(maxlen=STREAM_STATS_HISTORY)
+        # Cached status for the hot path; is_available() is the live check it probes with
+        self.availability = ProviderAvailability(self.name, self.is_available, configured=self.is_configured)
+    
     def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> str:
         """Generate response from LLM"""
-        pass
+        return self._generate_checked(prompt, context)[0]
     
     @abstractmethod
     def is_available(self) -> bool:
         """Check if provider is available"""
         pass
+    
+    def is_configured(self) -> bool:
+        """Whether the provider has the settings it needs (e.g. an API key); never touches the network"""
+        return True
+    
+    async def agenerate(self, session: aiohttp.ClientSession, prompt: str, context: Dict[str, Any] = None) -> str:
+        """generate_response on a shared aiohttp session"""
+        return (await self._agenerate_checked(session, prompt, context))[0]
+    
+    def _completion_request(self, prompt: str, context: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """(url, JSON body, headers) of one non-streaming completion"""
+        raise NotImplementedError
+    
+    def _parse_completion(self, result: Dict[str, Any]) -> str:
+        """Response text from the completion's JSON body"""
+        raise NotImplementedError
+    
+    def _generate(self, prompt: str, context: Optional[Dict[str, Any]]) -> str:
+        """One blocking completion; raises on failure"""
+        url, payload, headers = self._completion_request(prompt, context)
+        response = self._request('POST', url, json=payload, headers=headers)
+        response.raise_for_status()
+        self.availability.record_success()
+        return self._parse_completion(response.json())
+    
+    async def _agenerate(self, session: aiohttp.ClientSession, prompt: str, context: Optional[Dict[str, Any]]) -> str:
+        """One completion on an aiohttp session; raises on failure.
+        
+        Cancelling the awaiting task closes the connection mid-request, so the
+        server stops generating instead of finishing a reply nobody reads.
+        """
+        url, payload, headers = self._completion_request(prompt, context)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+        started = time.perf_counter()
+        try:
+            response = await session.post(url, json=payload, headers=headers, timeout=timeout)
+        except Exception:
+            self._record_request(started, None)
+            raise
+        self._record_request(started, response.status)
+        async with response:
+            response.raise_for_status()
+            result = await response.json(content_type=None)
+        self.availability.record_success()
+        return self._parse_completion(result)
+    
+    def _unavailable_message(self) -> Optional[str]:
+        """Why the provider cannot be called right now (from cached state only), or None"""
+        if not self.availability.get():
+            return f"{self.display_name} is not available."
+        return None
+    
+    def _generate_checked(self, prompt: str, context: Optional[Dict[str, Any]]) -> Tuple[str, bool]:
+        """(response, True), or (message, False) when the provider is unavailable or the call failed"""
+        unavailable = self._unavailable_message()
+        if unavailable:
+            return unavailable, False
+        try:
+            return self._generate(prompt, context), True
+        except Exception as e:
+            self._record_failure(e)
+            logger.error(f"{self.display_name} API error: {e}")
+            return f"Error generating response: {str(e)}", False
+    
+    async def _agenerate_checked(self, session: aiohttp.ClientSession, prompt: str,
+                                 context: Optional[Dict[str, Any]]) -> Tuple[str, bool]:
+        """Async _generate_checked; cancellation is passed on, not turned into a message"""
+        unavailable = self._unavailable_message()
+        if unavailable:
+            return unavailable, False
+        try:
+            return await self._agenerate(session, prompt, context), True
+        except Exception as e:
+            self._record_failure(e)
+            logger.error(f"{self.display_name} API error: {e}")
+            return f"Error generating response: {str(e)}", False
+    
+    def _build_payload(self, prompt: str, context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Request body for the prompt; also what response cache keys are built from"""
+        return {"prompt": prompt, "context": context, "temperature": self.temperature}
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        """Session whose keep-alive connections are shared, thread-safely, by all requests of this provider"""
+        session = requests.Session()
+        # Each provider talks to a single host, so one pool of pool_size connections
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+    
+    def set_pool_size(self, pool_size: int):
+        """Resize the connection pool; requests in flight finish on the old one"""
+        if pool_size == self.pool_size:
+            return
+        previous, self.session = self.session, self._create_session(pool_size)
+        self.pool_size = pool_size
+        previous.close()
+    
+    def _request(self, method: str, url: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """Send a request on the pooled session, recording its latency up to the response headers"""
+        timeout = (self.timeout[0], read_timeout) if read_timeout is not None else self.timeout
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self._record_request(started, status)
+    
+    def _record_request(self, started: float, status: Optional[int]):
+        self.request_stats.append({
+            'latency': round(time.perf_counter() - started, 4),
+            'status': status,
+            'timestamp': time.time()
+        })
+    
+    def latency_stats(self) -> Dict[str, Any]:
+        """Latency to response headers over recent requests (errors have no status)"""
+        calls = list(self.request_stats)
+        latencies = sorted(call['latency'] for call in calls if call['status'] is not None)
+        return {
+            'requests': len(calls),
+            'errors': sum(1 for call in calls if call['status'] is None or call['status'] >= 400),
+            'avg': round(sum(latencies) / len(latencies), 4) if latencies else None,
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'pool_size': self.pool_size,
+            'keep_alive': self.keep_alive
+        }
+    
+    def close(self):
+        self.session.close()
+    
+    def _record_failure(self, error: Exception):
+        if _is_outage(error):
+            self.availability.record_failure(error)
+    
+    def generate_stream(self, prompt: str, context: Dict[str, Any] = None) -> Iterator[str]:
+        """Yield the response as text deltas while it is being generated; raises StreamInterrupted
+        if the stream fails part way"""
+        return self._stream(prompt, context, {})
+    
+    def _stream(self, prompt: str, context: Optional[Dict[str, Any]], outcome: Dict[str, Any]) -> Iterator[str]:
+        """generate_stream, filling outcome['complete'] (False for messages about failures)"""
+        unavailable = self._unavailable_message()
+        if unavailable:
+            outcome['complete'] = False
+            yield unavailable
+            return
+        yield from self._measure_stream(self._stream_deltas(prompt, context, outcome), outcome)
+    
+    def _stream_deltas(self, prompt: str, context: Optional[Dict[str, Any]], outcome: Dict[str, Any]) -> Iterator[str]:
+        """Provider-specific stream parser; sets outcome['output_tokens'] when the API reports it.
+        Providers without a streaming endpoint yield the blocking response whole."""
+        yield self._generate(prompt, context)
+    
+    def _measure_stream(self, deltas: Iterator[str], outcome: Dict[str, Any]) -> Iterator[str]:
+        """Pass deltas through, recording time-to-first-token and tokens/sec for the call.
+        
+        A failure before the first delta yields an error message, like generate_response;
+        one after it raises StreamInterrupted, so partial text is never taken for a whole reply.
+        """
+        started = time.perf_counter()
+        first_token = None
+        received = []
+        complete = False
+        try:
+            for delta in deltas:
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                    self.availability.record_success()
+                received.append(delta)
+                yield delta
+            complete = True
+        except Exception as e:
+            self._record_failure(e)
+            logger.error(f"{self.display_name} streaming error: {e}")
+            if first_token is not None:
+                raise StreamInterrupted(f"{self.display_name} stream interrupted: {e}", "".join(received)) from e
+            yield f"Error generating response: {str(e)}"
+        finally:
+            duration = time.perf_counter() - started
+            outcome['complete'] = complete
+            # Without a usage report each streamed chunk counts as one token
+            tokens = outcome.get('output_tokens', len(received))
+            # Rate of the tokens after the first, only for streams read to the end
+            generating = duration - first_token if first_token is not None and complete else 0.0
+            self.stream_stats.append({
+                'model': self.model_name,
+                'time_to_first_token': round(first_token, 3) if first_token is not None else None,
+                'duration': round(duration, 3),
+                'tokens': tokens,
+                'tokens_per_sec': round((tokens - 1) / generating, 1) if generating > 0 and tokens > 1 else None,
+                'complete': complete,
+                'timestamp': time.time()
+            })
 
 class OllamaProvider(LLMProvider):
     """Ollama local LLM provider"""
     
-    def __init__(self, model_name: str = "llama2", base_url: str = "http://localhost:11434"):
+    name = "ollama"
+    display_name = "Ollama"
+    
+    def __init__(self, model_name: str = "llama2", base_url: str = "http://localhost:11434", **session_options):
+        super().__init__(**session_options)
         self.model_name = model_name
         self.base_url = base_url
         self.api_url = f"{base_url}/api/generate"
@@ -37,40 +549,49 @@ class OllamaProvider(LLMProvider):
     def is_available(self) -> bool:
         """Check if Ollama is running"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self._request('GET', f"{self.base_url}/api/tags", read_timeout=5)
             return response.status_code == 200
         except:
             return False
     
-    def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> str:
-        """Generate response using Ollama"""
-        if not self.is_available():
+    def _unavailable_message(self) -> Optional[str]:
+        if not self.availability.get():
             return "Ollama is not available. Please start Ollama service."
-        
-        # Build context-aware prompt
-        full_prompt = self._build_context_prompt(prompt, context)
-        
-        try:
-            payload = {
-                "model": self.model_name,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 500
-                }
-            }
-            
-            response = requests.post(self.api_url, json=payload, timeout=30)
+        return None
+    
+    def _completion_request(self, prompt: str, context: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        return self.api_url, self._build_payload(prompt, context, stream=False), {}
+    
+    def _parse_completion(self, result: Dict[str, Any]) -> str:
+        return result.get('response', 'No response generated')
+    
+    def _stream_deltas(self, prompt: str, context: Optional[Dict[str, Any]], outcome: Dict[str, Any]) -> Iterator[str]:
+        """Read Ollama's NDJSON stream: one JSON object per line, the last one with done=true"""
+        payload = self._build_payload(prompt, context, stream=True)
+        with self._request('POST', self.api_url, json=payload, stream=True) as response:
             response.raise_for_status()
-            
-            result = response.json()
-            return result.get('response', 'No response generated')
-            
-        except Exception as e:
-            logger.error(f"Ollama API error: {e}")
-            return f"Error generating response: {str(e)}"
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                yield chunk.get('response', '')
+                # Read on to the end of the body (not break) so the connection goes back to the pool
+                if chunk.get('done') and 'eval_count' in chunk:
+                    outcome['output_tokens'] = chunk['eval_count']
+    
+    def _build_payload(self, prompt: str, context: Optional[Dict[str, Any]], stream: bool = False) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "prompt": self._build_context_prompt(prompt, context),
+            "stream": stream,
+            "options": {
+                "temperature": self.temperature,
+                "top_p": 0.9,
+                "max_tokens": 500
+            }
+        }
     
     def _build_context_prompt(self, prompt: str, context: Dict[str, Any] = None) -> str:
         """Build context-aware prompt"""
@@ -131,55 +652,73 @@ class OllamaProvider(LLMProvider):
 class GeminiProvider(LLMProvider):
     """Google Gemini API provider"""
     
-    def __init__(self, api_key: str = None):
+    name = "gemini"
+    display_name = "Gemini"
+    
+    def __init__(self, api_key: str = None, model_name: str = "gemini-pro", **session_options):
+        super().__init__(**session_options)
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+        self.model_name = model_name
+        self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
+        self.stream_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:streamGenerateContent"
         
     def is_available(self) -> bool:
         """Check if Gemini API is available"""
         return bool(self.api_key)
     
-    def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> str:
-        """Generate response using Gemini API"""
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+    
+    def _unavailable_message(self) -> Optional[str]:
         if not self.is_available():
             return "Gemini API key not configured. Please set GEMINI_API_KEY environment variable."
+        return None
+    
+    def _completion_request(self, prompt: str, context: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        headers = {
+            "Content-Type": "application/json"
+        }
+        return f"{self.base_url}?key={self.api_key}", self._build_payload(prompt, context), headers
+    
+    def _parse_completion(self, result: Dict[str, Any]) -> str:
+        if 'candidates' in result and result['candidates']:
+            content = result['candidates'][0]['content']
+            if 'parts' in content and content['parts']:
+                return content['parts'][0]['text']
         
-        # Build context-aware prompt
-        full_prompt = self._build_context_prompt(prompt, context)
-        
-        try:
-            payload = {
-                "contents": [{
-                    "parts": [{
-                        "text": full_prompt
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "topP": 0.9,
-                    "maxOutputTokens": 500
-                }
-            }
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            url = f"{self.base_url}?key={self.api_key}"
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+        return "No response generated"
+    
+    def _stream_deltas(self, prompt: str, context: Optional[Dict[str, Any]], outcome: Dict[str, Any]) -> Iterator[str]:
+        """Read streamGenerateContent as server-sent events, one GenerateContentResponse each"""
+        url = f"{self.stream_url}?alt=sse&key={self.api_key}"
+        headers = {"Content-Type": "application/json"}
+        payload = self._build_payload(prompt, context)
+        with self._request('POST', url, json=payload, headers=headers, stream=True) as response:
             response.raise_for_status()
-            
-            result = response.json()
-            if 'candidates' in result and result['candidates']:
-                content = result['candidates'][0]['content']
-                if 'parts' in content and content['parts']:
-                    return content['parts'][0]['text']
-            
-            return "No response generated"
-            
-        except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            return f"Error generating response: {str(e)}"
+            for data in _iter_sse_data(response.iter_lines(chunk_size=None)):
+                chunk = json.loads(data)
+                if 'error' in chunk:
+                    raise RuntimeError(chunk['error'].get('message', chunk['error']))
+                # Token counts are cumulative, so the last report wins
+                if 'candidatesTokenCount' in chunk.get('usageMetadata', {}):
+                    outcome['output_tokens'] = chunk['usageMetadata']['candidatesTokenCount']
+                for candidate in chunk.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        yield part.get('text', '')
+    
+    def _build_payload(self, prompt: str, context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "contents": [{
+                "parts": [{
+                    "text": self._build_context_prompt(prompt, context)
+                }]
+            }],
+            "generationConfig": {
+                "temperature": self.temperature,
+                "topP": 0.9,
+                "maxOutputTokens": 500
+            }
+        }
     
     def _build_context_prompt(self, prompt: str, context: Dict[str, Any] = None) -> str:
         """Build context-aware prompt for Gemini"""
@@ -222,55 +761,82 @@ class GeminiProvider(LLMProvider):
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT API provider"""
     
-    def __init__(self, api_key: str = None):
+    name = "openai"
+    display_name = "OpenAI"
+    
+    def __init__(self, api_key: str = None, model_name: str = "gpt-3.5-turbo", **session_options):
+        super().__init__(**session_options)
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.model_name = model_name  # Can be changed to gpt-4
         self.base_url = "https://api.openai.com/v1/chat/completions"
         
     def is_available(self) -> bool:
         """Check if OpenAI API is available"""
         return bool(self.api_key)
     
-    def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> str:
-        """Generate response using OpenAI API"""
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+    
+    def _unavailable_message(self) -> Optional[str]:
         if not self.is_available():
             return "OpenAI API key not configured. Please set OPENAI_API_KEY environment variable."
+        return None
+    
+    def _completion_request(self, prompt: str, context: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        return self.base_url, self._build_payload(prompt, context), headers
+    
+    def _parse_completion(self, result: Dict[str, Any]) -> str:
+        if 'choices' in result and result['choices']:
+            return result['choices'][0]['message']['content']
         
-        try:
-            # Build messages array
-            messages = []
-            
-            # Add system message with context
-            if context:
-                system_context = self._build_system_context(context)
-                messages.append({"role": "system", "content": system_context})
-            
-            # Add user message
-            messages.append({"role": "user", "content": prompt})
-            
-            payload = {
-                "model": "gpt-3.5-turbo",  # Can be changed to gpt-4
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(self.base_url, json=payload, headers=headers, timeout=30)
+        return "No response generated"
+    
+    def _stream_deltas(self, prompt: str, context: Optional[Dict[str, Any]], outcome: Dict[str, Any]) -> Iterator[str]:
+        """Read chat completion chunks sent as server-sent events, ending with [DONE]"""
+        payload = self._build_payload(prompt, context)
+        payload["stream"] = True
+        # Adds a final chunk carrying the token usage
+        payload["stream_options"] = {"include_usage": True}
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        with self._request('POST', self.base_url, json=payload, headers=headers, stream=True) as response:
             response.raise_for_status()
-            
-            result = response.json()
-            if 'choices' in result and result['choices']:
-                return result['choices'][0]['message']['content']
-            
-            return "No response generated"
-            
-        except Exception as e:
-            logger.error(f"OpenAI API error: {e}")
-            return f"Error generating response: {str(e)}"
+            for data in _iter_sse_data(response.iter_lines(chunk_size=None)):
+                # Read on to the end of the body (not break) so the connection goes back to the pool
+                if data == '[DONE]':
+                    continue
+                chunk = json.loads(data)
+                if 'error' in chunk:
+                    raise RuntimeError(chunk['error'].get('message', chunk['error']))
+                if chunk.get('usage'):
+                    outcome['output_tokens'] = chunk['usage'].get('completion_tokens', 0)
+                for choice in chunk.get('choices', [])[:1]:
+                    yield choice.get('delta', {}).get('content') or ''
+    
+    def _build_payload(self, prompt: str, context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # Build messages array
+        messages = []
+        
+        # Add system message with context
+        if context:
+            system_context = self._build_system_context(context)
+            messages.append({"role": "system", "content": system_context})
+        
+        # Add user message
+        messages.append({"role": "user", "content": prompt})
+        
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": 500
+        }
     
     def _build_system_context(self, context: Dict[str, Any]) -> str:
         """Build system context message"""
@@ -294,14 +860,134 @@ class OpenAIProvider(LLMProvider):
 class LLMManager:
     """Manager for multiple LLM providers"""
     
-    def __init__(self):
+    def __init__(self, concurrency: int = DEFAULT_POOL_SIZE, response_cache: Optional[LLMResponseCache] = None):
+        # One pooled connection per request we may have in flight to each provider
+        self.concurrency = concurrency
+        # Optional; see enable_response_cache()
+        self.response_cache = response_cache
         self.providers = {
-            'ollama': OllamaProvider(),
-            'gemini': GeminiProvider(),
-            'openai': OpenAIProvider()
+            'ollama': OllamaProvider(pool_size=concurrency),
+            'gemini': GeminiProvider(pool_size=concurrency),
+            'openai': OpenAIProvider(pool_size=concurrency)
         }
         self.current_provider = 'ollama'  # Default to Ollama (free)
         
+        # agenerate() runs on one background event loop sharing one aiohttp session,
+        # with at most `concurrency` requests in flight per provider
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._session = None
+        self._limits = {}
+    
+    def set_concurrency(self, concurrency: int):
+        """Resize every provider's connection pool for this many concurrent requests"""
+        self.concurrency = concurrency
+        for provider in self.providers.values():
+            provider.set_pool_size(concurrency)
+        # New calls queue on fresh limits; calls in flight release the old ones
+        self._limits = {}
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-loop", daemon=True).start()
+        return self._loop
+    
+    async def _on_loop(self, coro) -> Any:
+        """Await a coroutine on the LLM loop from whichever loop the caller runs on"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        # Cancelling the caller cancels the task on the LLM loop too
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # Per-provider limits are enforced by _limit(); the connector only caches DNS and connections
+            connector = aiohttp.TCPConnector(limit=0, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    def _limit(self, provider_name: str) -> asyncio.Semaphore:
+        limit = self._limits.get(provider_name)
+        if limit is None:
+            limit = self._limits[provider_name] = asyncio.Semaphore(self.concurrency)
+        return limit
+    
+    async def agenerate(self, prompt: str, context: Dict[str, Any] = None, cache: Optional[bool] = None) -> str:
+        """Async generate_response for serving many conversations from one event loop.
+        
+        Calls beyond the current provider's concurrency limit wait for a slot.
+        Cancelling the awaiting task aborts the HTTP request (or leaves the queue).
+        """
+        return await self._on_loop(self._agenerate(prompt, context, cache))
+    
+    async def _agenerate(self, prompt: str, context: Optional[Dict[str, Any]], cache: Optional[bool]) -> str:
+        provider, error = self._select_provider()
+        if provider is None:
+            return error
+        
+        key = self._cache_key(provider, prompt, context, cache)
+        if key is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        async with self._limit(provider.name):
+            started = time.perf_counter()
+            response, ok = await provider._agenerate_checked(self._get_session(), prompt, context)
+        if key is not None and ok:
+            self.response_cache.set(key, response, time.perf_counter() - started)
+        return response
+    
+    def get_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider request latency (to response headers) over recent requests"""
+        return {
+            name: provider.latency_stats()
+            for name, provider in self.providers.items() if provider.request_stats
+        }
+    
+    def enable_response_cache(self, max_entries: int = 256, ttl: float = 3600.0, disk_path: Optional[str] = None,
+                              max_temperature: float = CACHE_MAX_TEMPERATURE) -> LLMResponseCache:
+        """Reuse responses to repeated prompts (see LLMResponseCache)"""
+        if self.response_cache is not None:
+            self.response_cache.close()
+        self.response_cache = LLMResponseCache(max_entries, ttl, disk_path, max_temperature)
+        return self.response_cache
+    
+    def disable_response_cache(self):
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hits, misses and generation time saved by the response cache"""
+        if self.response_cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.response_cache.stats()}
+    
+    def _cache_key(self, provider: LLMProvider, prompt: str, context: Optional[Dict[str, Any]],
+                   cache: Optional[bool]) -> Optional[str]:
+        if self.response_cache is None or not self.response_cache.should_cache(provider, cache):
+            return None
+        return self.response_cache.make_key(provider, prompt, context)
+    
+    def close(self):
+        """Close connection pools, the response cache and the async loop"""
+        for provider in self.providers.values():
+            provider.close()
+        self.disable_response_cache()
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        self._limits = {}
+        loop.call_soon_threadsafe(loop.stop)
+        
     def set_provider(self, provider_name: str):
         """Set the current LLM provider"""
         if provider_name in self.providers:
@@ -310,30 +996,111 @@ class LLMManager:
         else:
             logger.error(f"Provider {provider_name} not found")
     
-    def get_available_providers(self) -> List[str]:
-        """Get list of available providers"""
+    def get_available_providers(self, refresh: bool = False) -> List[str]:
+        """Get list of available providers (cached status unless refresh probes them all now)"""
+        if refresh:
+            probes = [
+                threading.Thread(target=provider.availability.refresh, daemon=True)
+                for provider in self.providers.values()
+            ]
+            for probe in probes:
+                probe.start()
+            for probe in probes:
+                probe.join()
         available = []
         for name, provider in self.providers.items():
-            if provider.is_available():
+            if provider.availability.get():
                 available.append(name)
         return available
     
-    def generate_response(self, prompt: str, context: Dict[str, Any] = None) -> str:
-        """Generate response using current provider"""
+    def get_provider_status(self) -> Dict[str, Dict[str, Any]]:
+        """Cached availability of every provider, with its age and where it came from"""
+        return {name: provider.availability.status() for name, provider in self.providers.items()}
+    
+    def _select_provider(self) -> Tuple[Optional[LLMProvider], Optional[str]]:
+        """Current provider, falling back to Ollama for this call only; (None, message) if none can answer"""
         provider = self.providers.get(self.current_provider)
         if not provider:
-            return "No provider configured"
+            return None, "No provider configured"
         
-        if not provider.is_available():
-            # Try to fallback to Ollama if available
-            if self.current_provider != 'ollama' and self.providers['ollama'].is_available():
+        if not provider.availability.get():
+            # Try to fallback to Ollama if available; current_provider is kept so the
+            # next call goes back to it once it recovers
+            if self.current_provider != 'ollama' and self.providers['ollama'].availability.get():
                 logger.warning(f"{self.current_provider} not available, falling back to Ollama")
-                self.current_provider = 'ollama'
                 provider = self.providers['ollama']
             else:
-                return f"{self.current_provider} provider not available"
+                return None, f"{self.current_provider} provider not available"
+        
+        return provider, None
+    
+    def generate_response(self, prompt: str, context: Dict[str, Any] = None, cache: Optional[bool] = None) -> str:
+        """Generate response using current provider.
+        
+        With a response cache enabled, ``cache=True`` / ``False`` forces reuse on or off;
+        by default only low-temperature generations are reused.
+        """
+        provider, error = self._select_provider()
+        if provider is None:
+            return error
+        
+        key = self._cache_key(provider, prompt, context, cache)
+        if key is None:
+            return provider.generate_response(prompt, context)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        started = time.perf_counter()
+        response, ok = provider._generate_checked(prompt, context)
+        if ok:
+            self.response_cache.set(key, response, time.perf_counter() - started)
+        return response
+    
+    def generate_stream(self, prompt: str, context: Dict[str, Any] = None, cache: Optional[bool] = None) -> Iterator[str]:
+        """Yield the current provider's response as text deltas while it is being generated
+        (a cached response arrives as a single delta); raises StreamInterrupted if the stream
+        fails part way, and such a response is not cached"""
+        provider, error = self._select_provider()
+        if provider is None:
+            yield error
+            return
+        
+        key = self._cache_key(provider, prompt, context, cache)
+        if key is None:
+            yield from provider.generate_stream(prompt, context)
+            return
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
         
-        return provider.generate_response(prompt, context)
+        started = time.perf_counter()
+        outcome = {}
+        deltas = []
+        for delta in provider._stream(prompt, context, outcome):
+            deltas.append(delta)
+            yield delta
+        # Only streams read to the end without errors are stored
+        if outcome.get('complete'):
+            self.response_cache.set(key, "".join(deltas), time.perf_counter() - started)
+    
+    def get_stream_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Average time-to-first-token and tokens/sec over each provider's recent streaming calls"""
+        summary = {}
+        for name, provider in self.providers.items():
+            calls = list(provider.stream_stats)
+            if not calls:
+                continue
+            first_tokens = [call['time_to_first_token'] for call in calls if call['time_to_first_token'] is not None]
+            rates = [call['tokens_per_sec'] for call in calls if call['tokens_per_sec'] is not None]
+            summary[name] = {
+                'calls': len(calls),
+                'avg_time_to_first_token': round(sum(first_tokens) / len(first_tokens), 3) if first_tokens else None,
+                'avg_tokens_per_sec': round(sum(rates) / len(rates), 1) if rates else None,
+                'last': calls[-1]
+            }
+        return summary
     
     def get_provider_info(self) -> Dict[str, Any]:
         """Get information about current provider"""
@@ -343,7 +1110,7 @@ class LLMManager:
         
         return {
             "name": self.current_provider,
-            "available": provider.is_available(),
+            "available": provider.availability.get(),
             "type": "local" if self.current_provider == 'ollama' else "api"
         }
 
@@ -363,7 +1130,7 @@ llm_manager = LLMManager()
 
 def setup_llm_integration():
     """Setup LLM integration for the conversation system"""
-    available = llm_manager.get_available_providers()
+    available = llm_manager.get_available_providers(refresh=True)
     logger.info(f"Available LLM providers: {available}")
     
     if not available:
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Local Query: boolean query language for local file search.
+
+    error handler            both words, anywhere (implicit AND)
+    timeout OR deadline      either word
+    "connection reset"       exact phrase
+    /def \\w+_test/           regular expression
+    retry AND NOT (sleep OR -backoff)
+
+Words, phrases and regexes match case-insensitively as substrings. ``AND``,
+``OR`` and ``NOT`` must be upper case (``-word`` is short for ``NOT word``);
+anything that does not parse is searched as one literal string.
+
+The literals of a query compile into a single matcher - an Aho-Corasick
+automaton when pyahocorasick is installed, otherwise one combined regex tried at
+every position - and its regexes into one more, so each text is scanned once or
+twice for every pattern and the match positions feed both the boolean check and
+snippet highlighting.
+"""
+
+import re
+import heapq
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Tuple, Iterator, Set
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Longest match a regex may span across a chunk boundary when scanning files in chunks
+REGEX_MAX_SPAN = 1024
+TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|/((?:[^/\\]|\\.)+)/|(-)(?=\S)|([^\s()"]+))')
+OPERATORS = ('AND', 'OR', 'NOT')
+# Words made only of these characters never span two folder index tokens
+WORD_TOKEN = re.compile(r'\w+')
+
+
+class QueryError(ValueError):
+    """Raised for queries that cannot be parsed"""
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Unexpected character at {position}: {text[position:]!r}")
+        position = match.end()
+        open_paren, close_paren, phrase, regex, minus, word = match.groups()
+        if open_paren:
+            tokens.append(('(', open_paren))
+        elif close_paren:
+            tokens.append((')', close_paren))
+        elif phrase is not None:
+            tokens.append(('phrase', re.sub(r'\\(.)', r'\1', phrase)))
+        elif regex is not None:
+            tokens.append(('regex', regex.replace('\\/', '/')))
+        elif minus:
+            tokens.append(('NOT', minus))
+        elif word in OPERATORS:
+            tokens.append((word, word))
+        else:
+            tokens.append(('word', word))
+    return tokens
+
+
+class LocalQuery:
+    """A parsed query: a boolean tree over patterns plus one matcher for all of them"""
+
+    def __init__(self, text: str):
+        self.text = text
+        # (kind, source) per pattern; kind is 'word', 'phrase' or 'regex'
+        self.patterns: List[Tuple[str, str]] = []
+        self._pattern_ids: Dict[Tuple[str, str], int] = {}
+        try:
+            self._tokens = _tokenize(text)
+            self._position = 0
+            self.root = self._parse_or() if self._tokens else None
+            if self._position != len(self._tokens):
+                raise QueryError(f"Unexpected {self._tokens[self._position][1]!r}")
+            self._compile()
+        except (QueryError, re.error) as e:
+            logger.warning(f"Searching {text!r} as a literal string: {e}")
+            self.patterns, self._pattern_ids = [], {}
+            self.root = self._add_pattern('phrase', text.strip()) if text.strip() else None
+            self._compile()
+
+    # --- Parsing ---
+
+    def _peek(self) -> Optional[str]:
+        return self._tokens[self._position][0] if self._position < len(self._tokens) else None
+
+    def _parse_or(self) -> Any:
+        children = [self._parse_and()]
+        while self._peek() == 'OR':
+            self._position += 1
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def _parse_and(self) -> Any:
+        children = [self._parse_unary()]
+        while self._peek() not in (None, 'OR', ')'):
+            if self._peek() == 'AND':
+                self._position += 1
+            children.append(self._parse_unary())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def _parse_unary(self) -> Any:
+        if self._peek() == 'NOT':
+            self._position += 1
+            return ('not', self._parse_unary())
+        return self._parse_primary()
+
+    def _parse_primary(self) -> Any:
+        kind = self._peek()
+        if kind is None:
+            raise QueryError("Query ends unexpectedly")
+        value = self._tokens[self._position][1]
+        self._position += 1
+        if kind == '(':
+            node = self._parse_or()
+            if self._peek() != ')':
+                raise QueryError("Missing closing parenthesis")
+            self._position += 1
+            return node
+        if kind in ('word', 'phrase', 'regex'):
+            if kind == 'regex':
+                re.compile(value)
+            elif not value:
+                raise QueryError("Empty phrase")
+            return self._add_pattern(kind, value)
+        raise QueryError(f"Unexpected {value!r}")
+
+    def _add_pattern(self, kind: str, source: str) -> Tuple[str, int]:
+        # Literals are case-insensitive, so "Foo" and "foo" share one pattern
+        key = (kind, source if kind == 'regex' else source.lower())
+        if key not in self._pattern_ids:
+            self._pattern_ids[key] = len(self.patterns)
+            self.patterns.append(key)
+        return ('pattern', self._pattern_ids[key])
+
+    # --- Matching ---
+
+    def _compile(self):
+        self._automaton = None
+        self._literal_regex = None
+        self._regex = None
+        self._implied = {}
+        literal_ids = [pattern_id for pattern_id, (kind, _) in enumerate(self.patterns) if kind != 'regex']
+        regex_ids = [pattern_id for pattern_id, (kind, _) in enumerate(self.patterns) if kind == 'regex']
+        self.max_span = max((len(self.patterns[pattern_id][1]) for pattern_id in literal_ids), default=1)
+        if regex_ids:
+            self.max_span = max(self.max_span, REGEX_MAX_SPAN)
+
+        if literal_ids and ahocorasick is not None:
+            # The automaton reports overlapping matches itself
+            self._automaton = ahocorasick.Automaton()
+            for pattern_id in literal_ids:
+                source = self.patterns[pattern_id][1]
+                self._automaton.add_word(source, (pattern_id, len(source)))
+            self._automaton.make_automaton()
+        elif literal_ids:
+            # A zero-width lookahead is tried at every position, so overlapping literals
+            # are all found. Only the longest of the literals starting at one position is
+            # reported, so remember which literals are prefixes of which.
+            order = sorted(literal_ids, key=lambda pattern_id: -len(self.patterns[pattern_id][1]))
+            self._literal_regex, self._literal_groups = self._combine(
+                order, '(?=(?:{}))', re.IGNORECASE, lambda source: re.escape(source)
+            )
+            self._implied = {
+                pattern_id: [
+                    other_id for other_id in literal_ids
+                    if other_id != pattern_id and self.patterns[pattern_id][1].startswith(self.patterns[other_id][1])
+                ]
+                for pattern_id in literal_ids
+            }
+        if regex_ids:
+            self._regex, self._groups = self._combine(regex_ids, '{}', re.IGNORECASE | re.MULTILINE, lambda source: source)
+
+    def _combine(self, pattern_ids: List[int], template: str, flags: int,
+                 to_regex: Any) -> Tuple[re.Pattern, List[Tuple[int, int]]]:
+        """One regex with a named group per pattern, and its (group, pattern_id) pairs in order"""
+        regex = re.compile(
+            template.format('|'.join(f"(?P<p{pattern_id}>{to_regex(self.patterns[pattern_id][1])})" for pattern_id in pattern_ids)),
+            flags
+        )
+        return regex, [(regex.groupindex[f"p{pattern_id}"], pattern_id) for pattern_id in pattern_ids]
+
+    @staticmethod
+    def _iter_groups(regex: re.Pattern, groups: List[Tuple[int, int]], text: str) -> Iterator[Tuple[int, int, int]]:
+        for match in regex.finditer(text):
+            for group, pattern_id in groups:
+                start = match.start(group)
+                if start != -1:
+                    if match.end(group) > start:
+                        yield start, match.end(group), pattern_id
+                    break
+
+    def finditer(self, text: str, text_lower: Optional[str] = None) -> Iterator[Tuple[int, int, int]]:
+        """Yield (start, end, pattern_id) for every match, in text order.
+
+        ``text_lower`` may be passed when the caller already lowercased the text.
+        """
+        streams = []
+        if self._automaton is not None:
+            streams.append(
+                (end - length + 1, end + 1, pattern_id)
+                for end, (pattern_id, length) in self._automaton.iter(text_lower if text_lower is not None else text.lower())
+            )
+        elif self._literal_regex is not None:
+            streams.append(self._iter_groups(self._literal_regex, self._literal_groups, text))
+        if self._regex is not None:
+            streams.append(self._iter_groups(self._regex, self._groups, text))
+        if len(streams) == 1:
+            yield from streams[0]
+        else:
+            # The automaton reports matches by end position, the regexes by start
+            yield from heapq.merge(*streams, key=(lambda match: match[1]) if self._automaton is not None else None)
+
+    def needs_lowercase(self) -> bool:
+        """Whether finditer works on lowercased text (automaton) rather than the original"""
+        return self._automaton is not None
+
+    def evaluate(self, matched: Set[int]) -> bool:
+        """Whether a text in which exactly these pattern ids matched satisfies the query"""
+        if self.root is None:
+            return False
+        if self._implied:
+            matched = set(matched)
+            for pattern_id in list(matched):
+                matched.update(self._implied.get(pattern_id, ()))
+        return self._evaluate(self.root, matched)
+
+    def _evaluate(self, node: Any, matched: Set[int]) -> bool:
+        kind, value = node
+        if kind == 'pattern':
+            return value in matched
+        if kind == 'not':
+            return not self._evaluate(value, matched)
+        if kind == 'and':
+            return all(self._evaluate(child, matched) for child in value)
+        return any(self._evaluate(child, matched) for child in value)
+
+    def match_text(self, text: str) -> Optional[List[Tuple[int, int, int]]]:
+        """All matches in text if it satisfies the query, otherwise None"""
+        matches = list(self.finditer(text, text.lower() if self.needs_lowercase() else None))
+        if not self.evaluate({pattern_id for _, _, pattern_id in matches}):
+            return None
+        return matches
+
+    def highlights(self, text: str) -> List[Tuple[int, int]]:
+        """(start, end) offsets of every pattern match in text"""
+        return [
+            (start, end)
+            for start, end, _ in self.finditer(text, text.lower() if self.needs_lowercase() else None)
+        ]
+
+    @property
+    def is_simple(self) -> bool:
+        """True for plain lists of single-token words, which the folder index can answer directly.
+
+        Each such word lies within one indexed token, so the index finds exactly
+        the files a scan would (see FolderIndex.search).
+        """
+        if self.root is None:
+            return False
+        nodes = self.root[1] if self.root[0] == 'and' else [self.root]
+        return all(
+            kind == 'pattern' and self.patterns[value][0] == 'word' and WORD_TOKEN.fullmatch(self.patterns[value][1])
+            for kind, value in nodes
+        )
+
+
+@lru_cache(maxsize=256)
+def compile_query(text: str) -> LocalQuery:
+    """Parse and compile a query (cached, so worker processes compile each query once)"""
+    return LocalQuery(text)
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Search Benchmark: offline performance harness for advanced_search_engine.
+
+Starts a local HTTP stand-in that replays the recorded engine responses in
+benchmark_fixtures/ (with configurable injected latency and error rate), points
+every remote engine at it and drives search, combi_fetch and folder_fetch at
+fixed concurrency levels. Throughput, p50/p95/p99 latency, cache hit rate and
+peak RSS are written as JSON so runs can be diffed or compared with --compare.
+
+    python search_benchmark.py --concurrency 1,8,32 --requests 200 --output run.json
+    python search_benchmark.py --latency 0.2 --error-rate 0.05 --compare run.json
+    python search_benchmark.py --record "python async"   # refresh fixtures from the live APIs
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_fixtures")
+FIXTURES = {
+    'brave': ('brave.json', 'application/json'),
+    'github': ('github.json', 'application/json'),
+    'wikipedia': ('wikipedia.json', 'application/json'),
+    'arxiv': ('arxiv.xml', 'application/atom+xml'),
+    'stackoverflow': ('stackexchange.json', 'application/json'),
+}
+SCENARIOS = ('search', 'combi_fetch', 'folder_fetch', 'folder_scan')
+VOCABULARY = (
+    "async await event loop task future coroutine socket buffer stream queue "
+    "thread process pool cache index token parser request response latency "
+    "throughput python search engine result query vector database schedule "
+    "timeout retry session connection handler server client memory profile"
+).split()
+
+
+class StandInServer:
+    """Threaded HTTP server that replays one recorded response per engine path"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 engine_latency: Optional[Dict[str, float]] = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.engine_latency = engine_latency or {}
+        self.bodies = {}
+        for engine_name, (filename, content_type) in FIXTURES.items():
+            with open(os.path.join(FIXTURE_DIR, filename), 'rb') as f:
+                self.bodies[engine_name] = (f.read(), content_type)
+        self.requests = {engine_name: 0 for engine_name in FIXTURES}
+        self.errors = {engine_name: 0 for engine_name in FIXTURES}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep connections alive like they would against the real APIs
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stand_in._respond(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _respond(self, handler: BaseHTTPRequestHandler):
+        engine_name = handler.path.split('?', 1)[0].strip('/')
+        if engine_name not in self.bodies:
+            self._send(handler, 404, b'', 'text/plain')
+            return
+
+        mean = self.engine_latency.get(engine_name, self.latency)
+        with self._lock:
+            delay = max(0.0, self._random.gauss(mean, self.jitter)) if self.jitter else mean
+            failed = self._random.random() < self.error_rate
+            self.requests[engine_name] += 1
+            if failed:
+                self.errors[engine_name] += 1
+
+        time.sleep(delay)
+        if failed:
+            self._send(handler, 503, b'{"error": "injected failure"}', 'application/json')
+        else:
+            self._send(handler, 200, *self.bodies[engine_name])
+
+    def _send(self, handler: BaseHTTPRequestHandler, status: int, body: bytes, content_type: str):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {'requests': sum(self.requests.values()), 'errors': sum(self.errors.values())}
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """High-water RSS of this process and of its largest child (folder_scan workers)"""
+    if resource is None:
+        return {'self': None, 'children': None}
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def build_corpus(folder: str, files: int, words_per_file: int, seed: int) -> str:
+    """Write a synthetic source tree for the folder_fetch scenarios"""
+    rng = random.Random(seed)
+    extensions = ('.txt', '.md', '.py')
+    for i in range(files):
+        subdir = os.path.join(folder, f"pkg{i % 10}")
+        os.makedirs(subdir, exist_ok=True)
+        words = rng.choices(VOCABULARY, k=words_per_file)
+        lines = [' '.join(words[j:j + 12]) for j in range(0, len(words), 12)]
+        with open(os.path.join(subdir, f"module{i}{extensions[i % len(extensions)]}"), 'w') as f:
+            f.write('\n'.join(lines))
+    return folder
+
+
+def build_workload(count: int, unique: int, words: int, seed: int) -> List[str]:
+    """Queries drawn with a Zipf-like skew so repeated queries exercise the cache"""
+    rng = random.Random(seed)
+    pool = [' '.join(rng.sample(VOCABULARY, words)) for _ in range(unique)]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    return rng.choices(pool, weights=weights, k=count)
+
+
+def point_engines_at(engine, base_url: str, keep_rate_limits: bool = False):
+    """Send every remote engine to the stand-in server"""
+    from advanced_search_engine import RateLimiter
+
+    for engine_name, search_engine in engine.engines.items():
+        search_engine.base_url = f"{base_url}/{engine_name}"
+        if not keep_rate_limits:
+            # The public API quotas would otherwise dominate every number
+            search_engine.rate_limiter = RateLimiter(
+                rate=1e6, burst=1_000_000, max_concurrency=search_engine.rate_limiter.max_concurrency
+            )
+
+
+def run_scenario(scenario: str, concurrency: int, args: argparse.Namespace,
+                 server: StandInServer, corpus: str) -> Dict[str, Any]:
+    from advanced_search_engine import AdvancedSearchEngine
+
+    engine = AdvancedSearchEngine(probe_interval=None, pool_size=max(100, concurrency),
+                                  query_deadline=args.deadline)
+    point_engines_at(engine, server.base_url, args.keep_rate_limits)
+    engine.clear_cache()
+
+    remote = scenario in ('search', 'combi_fetch')
+    queries = build_workload(args.requests, args.unique_queries, 2 if remote else 1, args.seed)
+    operations: Dict[str, Callable[[str], Any]] = {
+        'search': lambda query: engine.search(query, args.engines, args.max_results),
+        'combi_fetch': lambda query: engine.combi_fetch(query, args.engines, args.max_results),
+        'folder_fetch': lambda query: engine.folder_fetch(query, corpus, args.max_results, use_index=True),
+        'folder_scan': lambda query: engine.folder_fetch(query, corpus, args.max_results, use_index=False),
+    }
+    operation = operations[scenario]
+
+    report: Dict[str, Any] = {}
+    if scenario == 'folder_fetch':
+        start = time.perf_counter()
+        report['index_refresh'] = engine.get_folder_index(corpus).refresh()
+        report['index_build_seconds'] = round(time.perf_counter() - start, 4)
+
+    cache_before = engine.get_cache_stats()
+    upstream_before = server.counters()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(query: str):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            operation(query)
+            failed = False
+        except Exception as e:
+            logger.error(f"{scenario} failed for {query!r}: {e}")
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, queries))
+    wall = time.perf_counter() - wall_start
+
+    cache_after = engine.get_cache_stats()
+    upstream_after = server.counters()
+    engine.close()
+    engine.cache.close()
+    for index in engine.folder_indexes.values():
+        index.close()
+
+    hits = cache_after['hits'] - cache_before['hits']
+    misses = cache_after['misses'] - cache_before['misses']
+    latencies.sort()
+    report.update({
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'wall_seconds': round(wall, 4),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'p50': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            'p95': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            'p99': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            'max': round(latencies[-1] * 1000, 2) if latencies else None
+        },
+        'cache': {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if remote and hits + misses else None,
+            'stale_hits': cache_after['stale_hits'] - cache_before['stale_hits'],
+            'coalesced_requests': cache_after['coalesced_requests'] - cache_before['coalesced_requests']
+        },
+        'upstream': {
+            'requests': upstream_after['requests'] - upstream_before['requests'],
+            'injected_errors': upstream_after['errors'] - upstream_before['errors']
+        },
+        'peak_rss_mb': peak_rss_mb()
+    })
+    return report
+
+
+def compare_runs(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Relative change of throughput and tail latency for runs present in both reports"""
+    previous = {(run['scenario'], run['concurrency']): run for run in baseline.get('runs', [])}
+    changes = []
+    for run in current['runs']:
+        before = previous.get((run['scenario'], run['concurrency']))
+        if not before:
+            continue
+        change = {'scenario': run['scenario'], 'concurrency': run['concurrency']}
+        for name, new, old in (
+            ('throughput_rps', run['throughput_rps'], before['throughput_rps']),
+            ('p95_ms', run['latency_ms']['p95'], before['latency_ms']['p95']),
+            ('p99_ms', run['latency_ms']['p99'], before['latency_ms']['p99'])
+        ):
+            change[name] = round((new - old) / old, 4) if new is not None and old else None
+        changes.append(change)
+    return changes
+
+
+def record_fixtures(query: str):
+    """Overwrite the fixtures with live responses for one query"""
+    from advanced_search_engine import (
+        BraveSearchEngine, GitHubSearchEngine, WikipediaSearchEngine,
+        ArxivSearchEngine, StackOverflowSearchEngine
+    )
+
+    engines = {
+        'brave': BraveSearchEngine(),
+        'github': GitHubSearchEngine(),
+        'wikipedia': WikipediaSearchEngine(),
+        'arxiv': ArxivSearchEngine(),
+        'stackoverflow': StackOverflowSearchEngine()
+    }
+    for engine_name, engine in engines.items():
+        response = engine._make_request(*engine._build_request(query, 10))
+        if response is None:
+            logger.warning(f"Could not record {engine_name}, keeping the existing fixture")
+            continue
+        path = os.path.join(FIXTURE_DIR, FIXTURES[engine_name][0])
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        logger.info(f"Recorded {engine_name} -> {path} ({len(response.content)} bytes)")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the advanced search engine")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', default='1,4,16', help="comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=100, help="operations per scenario and level")
+    parser.add_argument('--unique-queries', type=int, default=30, help="distinct queries in the workload")
+    parser.add_argument('--engines', default=','.join(FIXTURES), help="engines used by search/combi_fetch")
+    parser.add_argument('--max-results', type=int, default=10)
+    parser.add_argument('--deadline', type=float, default=15.0, help="per-query deadline in seconds")
+    parser.add_argument('--latency', type=float, default=0.05, help="mean injected latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="latency standard deviation in seconds")
+    parser.add_argument('--engine-latency', action='append', default=[], metavar='ENGINE=SECONDS',
+                        help="override the mean latency of one engine (repeatable)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of upstream calls answered with 503")
+    parser.add_argument('--keep-rate-limits', action='store_true', help="keep the engines' real API rate limits")
+    parser.add_argument('--folder', help="folder for the folder_fetch scenarios (default: synthetic corpus)")
+    parser.add_argument('--files', type=int, default=300, help="files in the synthetic corpus")
+    parser.add_argument('--file-words', type=int, default=2000, help="words per synthetic file")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--compare', help="previous JSON report to compare against")
+    parser.add_argument('--record', metavar='QUERY', help="refresh the fixtures from the live APIs and exit")
+    parser.add_argument('--verbose', action='store_true', help="keep search engine logging")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+    if args.record:
+        logging.getLogger().setLevel(logging.INFO)
+        record_fixtures(args.record)
+        return 0
+
+    args.engines = [name.strip() for name in args.engines.split(',') if name.strip()]
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    levels = [int(level) for level in args.concurrency.split(',')]
+    engine_latency = {}
+    for override in args.engine_latency:
+        engine_name, _, seconds = override.partition('=')
+        engine_latency[engine_name.strip()] = float(seconds)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    folder = os.path.abspath(args.folder) if args.folder else None
+
+    # Caches and folder indexes are created relative to the working directory,
+    # so every run starts cold in a scratch directory
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="search-bench-")
+    os.chdir(workdir)
+    server = StandInServer(args.latency, args.jitter, args.error_rate, engine_latency, args.seed).start()
+    try:
+        corpus = folder
+        if corpus is None and any(scenario.startswith('folder') for scenario in scenarios):
+            corpus = build_corpus(os.path.join(workdir, "corpus"), args.files, args.file_words, args.seed)
+
+        runs = []
+        for scenario in scenarios:
+            for concurrency in levels:
+                print(f"Running {scenario} at concurrency {concurrency}...", file=sys.stderr)
+                runs.append(run_scenario(scenario, concurrency, args, server, corpus))
+    finally:
+        server.stop()
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'scenarios': scenarios,
+            'concurrency': levels,
+            'requests': args.requests,
+            'unique_queries': args.unique_queries,
+            'engines': args.engines,
+            'max_results': args.max_results,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'engine_latency': engine_latency,
+            'error_rate': args.error_rate,
+            'keep_rate_limits': args.keep_rate_limits,
+            'folder': folder,
+            'files': None if folder else args.files,
+            'file_words': None if folder else args.file_words,
+            'seed': args.seed
+        },
+        'runs': runs
+    }
+    if baseline_path:
+        with open(baseline_path) as f:
+            report['comparison'] = compare_runs(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Checks for LLMManager's streaming, response cache and async generation, run
+against a fake provider so no model or network access is needed.
+
+    python -m pytest test_llm_integration.py
+"""
+
+import asyncio
+
+import pytest
+
+from llm_integration import LLMManager, LLMProvider, StreamInterrupted
+
+
+class FakeProvider(LLMProvider):
+    """Answers every prompt with its words upper-cased, optionally failing part way"""
+
+    name = "ollama"
+    display_name = "Fake"
+    model_name = "fake-1"
+    temperature = 0.0
+
+    def __init__(self, fail_after=None, delay=0.0):
+        super().__init__()
+        self.fail_after = fail_after
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    def is_available(self) -> bool:
+        return True
+
+    def _generate(self, prompt, context):
+        self.calls += 1
+        return prompt.upper()
+
+    def _stream_deltas(self, prompt, context, outcome):
+        self.calls += 1
+        for i, word in enumerate(prompt.upper().split()):
+            if self.fail_after is not None and i == self.fail_after:
+                raise ConnectionResetError("connection reset by peer")
+            yield word + " "
+
+    async def _agenerate(self, session, prompt, context):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return prompt.upper()
+
+
+@pytest.fixture
+def manager():
+    manager = LLMManager(concurrency=2)
+    manager.providers['ollama'] = FakeProvider()
+    manager.set_provider('ollama')
+    yield manager
+    manager.close()
+
+
+def test_stream_is_cached_once_read_to_the_end(manager):
+    provider = manager.providers['ollama']
+    manager.enable_response_cache()
+    assert list(manager.generate_stream("hello there")) == ["HELLO ", "THERE "]
+    # Answered from the cache as one delta, without calling the provider
+    assert list(manager.generate_stream("Hello   There")) == ["HELLO THERE "]
+    assert provider.calls == 1
+    assert manager.get_cache_stats()['hits'] == 1
+    assert provider.stream_stats[-1]['complete']
+
+
+def test_interrupted_stream_raises_and_is_not_cached(manager):
+    provider = manager.providers['ollama'] = FakeProvider(fail_after=2)
+    manager.enable_response_cache()
+    received = []
+    with pytest.raises(StreamInterrupted) as interrupted:
+        for delta in manager.generate_stream("one two three four"):
+            received.append(delta)
+    assert received == ["ONE ", "TWO "]
+    assert interrupted.value.partial == "ONE TWO "
+    assert not provider.stream_stats[-1]['complete']
+    assert manager.get_cache_stats()['memory_entries'] == 0
+    provider.fail_after = None
+    assert list(manager.generate_stream("one two three four")) == ["ONE ", "TWO ", "THREE ", "FOUR "]
+    assert provider.calls == 2
+
+
+def test_failure_before_the_first_delta_yields_an_error_message(manager):
+    manager.providers['ollama'] = FakeProvider(fail_after=0)
+    manager.enable_response_cache()
+    deltas = list(manager.generate_stream("one two"))
+    assert len(deltas) == 1 and deltas[0].startswith("Error generating response")
+    assert manager.get_cache_stats()['memory_entries'] == 0
+
+
+def test_response_cache_hits_and_misses(manager):
+    provider = manager.providers['ollama']
+    manager.enable_response_cache()
+    assert manager.generate_response("what is rag") == "WHAT IS RAG"
+    assert manager.generate_response("What is RAG") == "WHAT IS RAG"
+    assert manager.generate_response("what is rag", context={'summary': "other chat"}) == "WHAT IS RAG"
+    # Opting out skips the cache both ways
+    assert manager.generate_response("what is rag", cache=False) == "WHAT IS RAG"
+    stats = manager.get_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['memory_entries']) == (1, 2, 2)
+    assert provider.calls == 3
+
+
+def test_creative_generations_are_not_cached_unless_asked(manager):
+    provider = manager.providers['ollama']
+    provider.temperature = 0.9
+    manager.enable_response_cache()
+    manager.generate_response("tell me a story")
+    manager.generate_response("tell me a story")
+    assert provider.calls == 2
+    manager.generate_response("hi", cache=True)
+    manager.generate_response("hi", cache=True)
+    assert provider.calls == 3
+
+
+def test_agenerate_runs_at_most_concurrency_requests(manager):
+    provider = manager.providers['ollama'] = FakeProvider(delay=0.05)
+
+    async def generate_all():
+        return await asyncio.gather(*(manager.agenerate(f"prompt {i}") for i in range(8)))
+
+    replies = asyncio.run(generate_all())
+    assert replies == [f"PROMPT {i}" for i in range(8)]
+    assert provider.calls == 8
+    assert provider.peak == 2
+
+
+def test_agenerate_uses_the_response_cache(manager):
+    provider = manager.providers['ollama']
+    manager.enable_response_cache()
+
+    async def generate_twice():
+        return [await manager.agenerate("ping"), await manager.agenerate("PING")]
+
+    assert asyncio.run(generate_twice()) == ["PING", "PING"]
+    assert provider.calls == 1
+
+
+def test_provider_without_api_key_falls_back_before_any_call(manager, monkeypatch):
+    gemini = manager.providers['gemini']
+    monkeypatch.setattr(gemini, 'api_key', None)
+    manager.set_provider('gemini')
+    assert manager.get_available_providers() == ['ollama']
+    assert manager.generate_response("hello") == "HELLO"
+    assert manager.providers['ollama'].calls == 1
+    assert gemini.availability.probes == 0 and not gemini.request_stats
+    assert manager.get_provider_status()['gemini']['configured'] is False
+    assert manager.current_provider == 'gemini'
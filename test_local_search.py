@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Checks that folder_fetch answers the same in "swift" mode (folder index) and
+"deep" mode (scan) for the query forms the index handles.
+
+    python -m pytest test_local_search.py
+"""
+
+import os
+
+import pytest
+
+import custom_mcp_server
+import folder_index
+import local_query
+from advanced_search_engine import AdvancedSearchEngine
+from file_discovery import FileDiscovery
+from folder_index import FolderIndex
+
+CORPUS = {
+    'a.txt': "An error was logged while retrying.",
+    'b.txt': "The error handler closes the socket.",
+    'c.py': "import asyncio\n\nasync def handle():\n    await asyncio.sleep(1)\n",
+    'notes/d.md': "Handlers are registered before the first error.",
+}
+
+QUERIES = [
+    "error",
+    "error handler",
+    "handler error",
+    "sync",
+    "handle",
+    "ERROR Handler",
+    "asyncio sleep",
+    "error asyncio",
+    "missing",
+]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # The search cache and folder indexes are created in the working directory
+    monkeypatch.chdir(tmp_path)
+    engine = AdvancedSearchEngine(probe_interval=None)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    folder = tmp_path / "corpus"
+    for name, content in CORPUS.items():
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return str(folder)
+
+
+def _files(results):
+    return sorted(os.path.basename(result.metadata['path']) for result in results)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_swift_and_deep_modes_return_same_files(engine, corpus, query):
+    swift = engine.folder_fetch(query, corpus, max_results=10, use_index=True)
+    deep = engine.folder_fetch(query, corpus, max_results=10, use_index=False)
+    assert _files(swift) == _files(deep)
+
+
+def test_plain_words_are_an_implicit_and(engine, corpus):
+    assert _files(engine.folder_fetch("error handler", corpus, use_index=True)) == ['b.txt', 'd.md']
+    assert _files(engine.folder_fetch("sync", corpus, use_index=True)) == ['c.py']
+
+
+def test_leading_slash_anchors_gitignore_pattern(tmp_path):
+    for name in ('build/a.txt', 'src/build/b.txt'):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+    (tmp_path / '.gitignore').write_text("/build/\n")
+    found = sorted(os.path.relpath(path, tmp_path) for path, _ in FileDiscovery(extensions=('.txt',)).walk(str(tmp_path)))
+    assert found == [os.path.join('src', 'build', 'b.txt')]
+
+
+def test_size_cap_defaults_to_bundles_and_is_configurable(engine, corpus):
+    with open(os.path.join(corpus, 'big.md'), 'w') as f:
+        f.write("error handler " + "x" * (3 * 1024 * 1024))
+    with open(os.path.join(corpus, 'big.json'), 'w') as f:
+        f.write('{"error": "handler", "pad": "' + "x" * (3 * 1024 * 1024) + '"}')
+    for use_index in (True, False):
+        assert _files(engine.folder_fetch("error handler", corpus, use_index=use_index)) == ['b.txt', 'big.md', 'd.md']
+        assert _files(engine.folder_fetch("error handler", corpus, use_index=use_index, max_file_size=1024)) == ['b.txt', 'd.md']
+        assert _files(engine.folder_fetch("error handler", corpus, use_index=use_index, max_file_size=0)) == \
+            ['b.txt', 'big.json', 'big.md', 'd.md']
+
+
+def test_combined_search_caps_every_extension(corpus, monkeypatch):
+    monkeypatch.chdir(corpus)
+    with open('big.log', 'w') as f:
+        f.write("error handler " + "x" * 2048)
+
+    def found(**kwargs):
+        return sorted(os.path.basename(path) for path in custom_mcp_server.combined_search("error handler", **kwargs)["files"])
+
+    assert found(max_file_size=1024) == ['b.txt', 'd.md']
+    assert found() == ['b.txt', 'big.log', 'd.md']
+
+
+@pytest.mark.parametrize("automaton", [True, False])
+def test_overlapping_literals_match_with_and_without_automaton(monkeypatch, automaton):
+    if not automaton:
+        monkeypatch.setattr(local_query, 'ahocorasick', None)
+    elif local_query.ahocorasick is None:
+        pytest.skip("pyahocorasick not installed")
+    assert local_query.LocalQuery("foobar barbaz").match_text("foobarbaz") is not None
+    assert local_query.LocalQuery("ab bc cd").match_text("abcd") is not None
+    assert local_query.LocalQuery("foo foobar").match_text("xfoobarx") is not None
+    assert local_query.LocalQuery("foobar barbaz").match_text("foobar baz") is None
+
+
+def test_unselective_words_are_left_to_the_scan(engine, corpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(folder_index, 'MAX_TERM_EXPANSIONS', 4)
+    for i in range(6):
+        with open(os.path.join(corpus, f'z{i}.txt'), 'w') as f:
+            f.write(f"zork{i} error")
+    index = FolderIndex(corpus, index_dir=str(tmp_path / "indexes"))
+    index.refresh()
+    # Six terms contain "zork", more than the cap; "e" is shorter than a trigram
+    assert index.search("zork") is None
+    assert index.search("error e") is None
+    assert [os.path.basename(hit['path']) for hit in index.search("zork3")] == ['z3.txt']
+    index.close()
+    for query in ("zork", "e", "zork error"):
+        assert _files(engine.folder_fetch(query, corpus, max_results=20, use_index=True)) == \
+            _files(engine.folder_fetch(query, corpus, max_results=20, use_index=False))
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Checks for the web search side of AdvancedSearchEngine, run against stubbed
+engines so no network access is needed.
+
+    python -m pytest test_search_engine.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from advanced_search_engine import AdvancedSearchEngine, AtomEntryParser, CircuitBreaker, SearchCache, SearchResult
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # The search cache is created in the working directory
+    monkeypatch.chdir(tmp_path)
+    engine = AdvancedSearchEngine(probe_interval=None)
+    yield engine
+    engine.close()
+
+
+class StubSearch:
+    """Stands in for an engine's asearch, recording how many calls run at once"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.cancelled = []
+
+    async def __call__(self, session, query, max_results=10):
+        self.calls.append(query)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(query, 0.01))
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        finally:
+            self.active -= 1
+        return [SearchResult(title=query, url=f"https://example.com/{query}", snippet=query, source='GitHub')]
+
+
+@pytest.fixture
+def stub(engine, monkeypatch):
+    stub = StubSearch()
+    monkeypatch.setattr(engine.engines['github'], 'asearch', stub)
+    return stub
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SearchCache(cache_file=str(tmp_path / "cache.db"), purge_interval=3600)
+    yield cache
+    cache.close()
+
+
+def _results(*titles):
+    return [SearchResult(title=title, url=f"https://example.com/{title}", snippet=title, source='GitHub').to_dict()
+            for title in titles]
+
+
+def _make_stale(cache):
+    cache.conn.execute("UPDATE cache SET expires = ?", (time.time() - 1,))
+
+
+def test_failed_revalidation_keeps_serving_the_stale_entry(cache):
+    cache.set("asyncio", 'github', _results("a", "b"), 10)
+    _make_stale(cache)
+    cache.set("asyncio", 'github', [], 10, failed=True)
+    results, stale = cache.lookup("asyncio", 'github', 10)
+    assert stale and [r['title'] for r in results] == ["a", "b"]
+    # Without an entry to protect, the failure itself is cached
+    cache.set("missing", 'github', [], 10, failed=True)
+    assert cache.lookup("missing", 'github', 10) == ([], False)
+
+
+def test_negative_entries_expire(tmp_path):
+    cache = SearchCache(cache_file=str(tmp_path / "cache.db"), purge_interval=3600, negative_ttl=0.05)
+    cache.set("nothing here", 'github', [], 10)
+    assert cache.lookup("nothing here", 'github', 10) == ([], False)
+    assert cache.negative_hits == 1
+    time.sleep(0.1)
+    assert cache.lookup("nothing here", 'github', 10) is None
+    cache.close()
+
+
+def test_lru_eviction_drops_the_least_recently_used_entry(tmp_path):
+    cache = SearchCache(cache_file=str(tmp_path / "cache.db"), purge_interval=3600, max_entries=2)
+    cache.set("first", 'github', _results("1"), 10)
+    time.sleep(0.01)
+    cache.set("second", 'github', _results("2"), 10)
+    time.sleep(0.01)
+    assert cache.lookup("first", 'github', 10) is not None
+    cache.set("third", 'github', _results("3"), 10)
+    assert cache.lookup("second", 'github', 10) is None
+    assert cache.lookup("first", 'github', 10) is not None
+    assert cache.lookup("third", 'github', 10) is not None
+    assert cache.size == 2 and cache.evictions == 1
+    cache.close()
+
+
+def test_larger_entries_answer_smaller_requests(cache):
+    cache.set("Asyncio  Tutorial", 'github', _results("a", "b", "c"), 3)
+    results, _ = cache.lookup("asyncio tutorial", 'github', 2)
+    assert [r['title'] for r in results] == ["a", "b"]
+    assert cache.subsumed_hits == 1 and cache.normalization_hits == 1
+    # A short entry only answers a larger request when the engine had nothing more
+    assert cache.lookup("asyncio tutorial", 'github', 10) is None
+    cache.set("rare", 'github', _results("x"), 5)
+    assert cache.lookup("rare", 'github', 10) is not None
+
+
+def test_concurrent_identical_searches_share_one_fetch(engine, stub):
+    stub.delays = {'asyncio': 0.1}
+
+    async def search_five_times():
+        return await asyncio.gather(*(engine._search_engine('github', 'asyncio', 10) for _ in range(5)))
+
+    answers = engine._run_sync(search_five_times())
+    assert stub.calls == ['asyncio']
+    assert engine.coalesced_requests == 4
+    assert all([r.title for r in results] == ['asyncio'] for results in answers)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker('stub', min_calls=2, error_threshold=0.5, cooldown=0.05)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow() and breaker.skipped == 1
+    time.sleep(0.06)
+    # One trial call once the cooldown has passed; a failure reopens the circuit
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_breaker_counts_slow_calls_as_failures():
+    breaker = CircuitBreaker('stub', min_calls=2, slow_call_threshold=1.0)
+    breaker.record(True, 2.0)
+    breaker.record(True, 3.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+ATOM_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>arXiv Query</title>
+  <entry>
+    <id>http://arxiv.org/abs/2101.00001v1</id>
+    <published>2021-01-01T00:00:00Z</published>
+    <title>Attention Is
+      Enough</title>
+    <summary>We study attention.</summary>
+    <author><name>Ada Lovelace</name></author>
+    <author><name>Alan Turing</name></author>
+    <link title="pdf" href="http://arxiv.org/pdf/2101.00001v1"/>
+    <category term="cs.LG"/>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2101.00002v1</id>
+    <title></title>
+  </entry>
+</feed>
+"""
+
+
+def test_atom_parser_emits_entries_as_they_close():
+    parser = AtomEntryParser()
+    first_close = ATOM_FEED.index(b"</entry>") + len(b"</entry>")
+    results = []
+    for start in range(0, len(ATOM_FEED), 16):
+        chunk_results = parser.feed(ATOM_FEED[start:start + 16])
+        if chunk_results and not results:
+            # The first entry arrives with the chunk that closes it, before the feed ends
+            assert start <= first_close < start + 16
+        results.extend(chunk_results)
+    assert len(results) == 2
+    paper, untitled = results
+    assert paper.title == "Attention Is Enough"
+    assert paper.url == "http://arxiv.org/abs/2101.00001v1"
+    assert paper.snippet == "We study attention."
+    assert paper.metadata == {
+        'authors': ["Ada Lovelace", "Alan Turing"],
+        'published': "2021-01-01T00:00:00Z",
+        'pdf_url': "http://arxiv.org/pdf/2101.00001v1",
+        'categories': ["cs.LG"]
+    }
+    assert untitled.title == "No Title" and untitled.snippet == "No Summary"
+
+
+def test_probes_use_cheap_endpoints_and_skip_brave(engine, monkeypatch):
+    probed = []
+
+    async def probe(engine_name):
+        probed.append(engine_name)
+
+    monkeypatch.setattr(engine, '_probe_engine', probe)
+    engine.refresh_engine_status()
+    assert probed and 'brave' not in probed
+    assert sorted(probed) == sorted(name for name in engine.engines if name != 'brave')
+    for name in probed:
+        url, params = engine.engines[name]._build_probe_request()
+        assert 'q' not in params and 'srsearch' not in params
+    assert engine.engines['github']._build_probe_request()[0].endswith('/rate_limit')
+    assert engine.engines['stackoverflow']._build_probe_request()[0].endswith('/2.3/info')
+    assert engine.engines['arxiv']._build_probe_request()[1]['max_results'] == 0
+
+
+def test_search_many_bounds_fetches_and_cancels_abandoned_ones(engine, stub):
+    stub.delays = {'slow0': 5, 'slow1': 5}
+    queries = ['slow0', 'slow1'] + [f"q{i}" for i in range(10)]
+    results = engine.search_many(queries, engines=['github'], deadline=0.2, concurrency=3)
+    assert stub.peak <= 3
+    assert results['slow0'] == {} and results['slow1'] == {}
+    assert all(results[f"q{i}"]['github'][0].title == f"q{i}" for i in range(10))
+    engine._run_sync(asyncio.sleep(0.05))
+    assert sorted(stub.cancelled) == ['slow0', 'slow1']
+    assert not engine._inflight
+
+
+def test_stale_refreshes_share_the_batch_bound(engine, stub):
+    engine.search_many([f"q{i}" for i in range(6)], engines=['github'])
+    _make_stale(engine.cache)
+    stub.calls.clear()
+    stub.peak = 0
+    queries = [f"q{i}" for i in range(6)] + [f"new{i}" for i in range(6)]
+    engine.search_many(queries, engines=['github'], concurrency=2)
+    engine._run_sync(asyncio.sleep(0.3))
+    assert stub.peak <= 2
+    assert sorted(stub.calls) == sorted(queries)
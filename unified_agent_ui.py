@@ -206,7 +206,7 @@ class UnifiedAgentUI:
         
         # Advanced Search Engine Integration
         try:
-            from advanced_search_engine import search_engine
+            import advanced_search_engine
             self.advanced_search_available = True
         except ImportError:
             self.advanced_search_available = False
@@ -466,6 +466,7 @@ class UnifiedAgentUI:
         
         self.conversation_display = scrolledtext.ScrolledText(conversation_display_frame.get_inner_frame(), height=15, bg=self.terminal_bg, fg=self.terminal_fg, insertbackground=self.accent, font=('Fira Mono', 11))
         self.conversation_display.pack(fill=tk.BOTH, expand=True, padx=4, pady=4)
+        self.conversation_reply_count = 0
         
         # Context information
         context_frame = CanvasLabelFrame(conversation_frame, text="Context Information", border_color=self.outline_grey, bg=self.bg_dark, fg=self.fg_light, accent=self.accent, label_green=True)
@@ -1074,15 +1075,22 @@ class UnifiedAgentUI:
         # Execute search in background thread
         def search_worker():
             try:
-                from advanced_search_engine import search_engine
-                results = search_engine.combi_fetch(
+                from advanced_search_engine import get_search_engine
+                search_engine = get_search_engine()
+                finished = []
+                
+                # Re-render the ranked list as each engine's results arrive
+                for engine_name, results in search_engine.combi_fetch_stream(
                     query=query,
                     engines=selected_engines,
                     max_results=self.combi_max_results.get()
-                )
+                ):
+                    finished.append(engine_name)
+                    snapshot = (list(results), list(finished))
+                    self.root.after(0, lambda snapshot=snapshot: self.display_combi_results(snapshot[0], query, selected_engines, snapshot[1]))
                 
-                # Update UI with results
-                self.root.after(0, lambda: self.display_combi_results(results, query, selected_engines))
+                if not finished:
+                    self.root.after(0, lambda: self.display_combi_results([], query, selected_engines, []))
                 
             except Exception as e:
                 error_msg = f"Combi_Fetch error: {str(e)}"
@@ -1091,7 +1099,7 @@ class UnifiedAgentUI:
         
         threading.Thread(target=search_worker, daemon=True).start()
     
-    def display_combi_results(self, results, query, engines):
+    def display_combi_results(self, results, query, engines, finished=None):
         """Display Combi_Fetch results"""
         self.search_results.delete('1.0', tk.END)
         
@@ -1099,6 +1107,8 @@ class UnifiedAgentUI:
         self.search_results.insert(tk.END, f"Combi_Fetch Results for: {query}\n")
         self.search_results.insert(tk.END, f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
         self.search_results.insert(tk.END, f"Engines Used: {', '.join(engines)}\n")
+        if finished is not None:
+            self.search_results.insert(tk.END, f"Engines Answered: {', '.join(finished) or 'none'}\n")
         self.search_results.insert(tk.END, f"Total Results: {len(results)}\n")
         self.search_results.insert(tk.END, "=" * 50 + "\n\n")
         
@@ -1149,11 +1159,13 @@ class UnifiedAgentUI:
         # Execute search in background thread
         def search_worker():
             try:
-                from advanced_search_engine import search_engine
+                from advanced_search_engine import get_search_engine
+                search_engine = get_search_engine()
                 results = search_engine.folder_fetch(
                     query=query,
                     folder_path=folder_path,
-                    max_results=50
+                    max_results=50,
+                    use_index=(self.folder_mode.get() == "swift")
                 )
                 
                 # Update UI with results
@@ -1216,20 +1228,41 @@ class UnifiedAgentUI:
         
         # Display user message
         self.conversation_display.insert(tk.END, f"User: {message}\n")
+        
+        # The reply is written at its own mark, so it stays in place if another message is sent meanwhile
+        self.conversation_reply_count += 1
+        reply_mark = f"reply_{self.conversation_reply_count}"
+        self.conversation_display.insert(tk.END, "Agent: \n")
+        self.conversation_display.mark_set(reply_mark, "end-2c")
+        self.conversation_display.mark_gravity(reply_mark, tk.RIGHT)
         self.conversation_display.see(tk.END)
         
         # Clear input
         self.conversation_message.set("")
         
+        def append_reply(text):
+            self.conversation_display.insert(reply_mark, text)
+            self.conversation_display.see(reply_mark)
+        
         # Process message in background thread
         def process_message():
+            streamed = []
+            
+            def on_delta(delta):
+                streamed.append(delta)
+                self.root.after(0, append_reply, delta)
+            
             try:
-                result = self.context_agent.process_message(message)
+                result = self.context_agent.process_message(message, on_delta=on_delta)
                 response = result['response']['content']
                 
-                # Update UI with response
-                self.root.after(0, lambda: self.conversation_display.insert(tk.END, f"Agent: {response}\n"))
-                self.root.after(0, lambda: self.conversation_display.see(tk.END))
+                # Template responses are not streamed, so they arrive whole
+                if not streamed:
+                    self.root.after(0, append_reply, response)
+                elif result['response']['type'] != 'llm_generated':
+                    # The stream broke off and the agent answered from a template instead
+                    self.root.after(0, append_reply, f" [interrupted]\n{response}")
+                self.root.after(0, lambda: self.conversation_display.mark_unset(reply_mark))
                 self.root.after(0, self.update_context_display)
                 
                 # Log activity
@@ -1237,7 +1270,8 @@ class UnifiedAgentUI:
                 
             except Exception as e:
                 error_msg = f"Error processing message: {str(e)}"
-                self.root.after(0, lambda: self.conversation_display.insert(tk.END, f"Error: {error_msg}\n"))
+                self.root.after(0, append_reply, f"Error: {error_msg}")
+                self.root.after(0, lambda: self.conversation_display.mark_unset(reply_mark))
                 self.log_activity(error_msg)
         
         threading.Thread(target=process_message, daemon=True).start()